@@ -22,9 +22,15 @@ class StudentModel(BaseModel):
     ad: str
     soyad: str
     ogrenciNo: str
-    fotograflar: List[str] # Fotoğrafın base64 formatında olması önerilir
+    fotograflar: List[str] # Fotoğrafın base64 formatında olması önerilir; belgeye değil fotoğraf deposuna yazılır
     lesson_name : List[str]  
 
+class StudentPhotosUpdate(BaseModel):
+    fotograflar: List[str] # Yeni fotoğraflar eklendiğinde kodlamalar yeniden hesaplanır
+
+class StudentLessonsUpdate(BaseModel):
+    lesson_name: List[str]
+
 
 """
 Yukaridaki sınıflar, özellikle FastAPI gibi framework'lerde, gelen verilerin doğrulanmasını ve yönetilmesini sağlar.
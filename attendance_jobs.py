@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# Ortak iş deposunda kuyrukta/işleniyor sayılan durumlar
+AKTIF_DURUMLAR = ["kuyrukta", "isleniyor"]
+
+
+class QueueFullError(Exception):
+    """
+    Bekleyen iş sayısı sınıra ulaştığında fırlatılır (API 429 döndürür).
+    """
+
+
+class AttendanceJobQueue:
+    """
+    Yüz tespiti ve kodlama gibi CPU yoğun işleri olay döngüsünün dışında,
+    sınırlı bir süreç havuzunda çalıştıran iş kuyruğu.
+    İş durumları bellekte tutulur ve iş kimliğiyle sorgulanır. store (motor koleksiyonu) verilirse
+    durumlar oraya da yazılır: birden fazla uvicorn işçisinde durum sorgusu hangi işçiye düşerse düşsün
+    yanıtlanır ve max_pending tüm işçilerin toplam aktif işine uygulanır.
+    """
+
+    def __init__(self, workers=None, max_pending=8, result_ttl=3600, store=None, stale_after=900):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.store = store
+        # Bu süredir güncellenmeyen aktif kayıtlar (çöken işçiden kalan) sınıra sayılmaz
+        self.stale_after = stale_after
+        self.jobs = {}
+        self.active = 0
+        # Olay döngüsü görevlere yalnızca zayıf referans tutar; bitene kadar burada saklanır
+        self._tasks = set()
+
+    def _prune(self):
+        """
+        Süresi dolan tamamlanmış işleri bellekten siler.
+        """
+        limit = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["bitis"] is not None and job["bitis"] < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def pending(self):
+        """
+        Sınıra sayılan aktif iş sayısı; ortak depo varsa tüm işçilerin toplamıdır.
+        """
+        if self.store is None:
+            return self.active
+        return await self.store.count_documents({
+            "durum": {"$in": AKTIF_DURUMLAR},
+            "guncelleme": {"$gt": time.time() - self.stale_after},
+        })
+
+    async def _save(self, job, expires_in):
+        """
+        İşi ortak depoya yazar; son_kullanma alanındaki TTL indeksi eski kayıtları siler.
+        Depo yazılamazsa iş yine de bu işçide sorgulanabilir kalır.
+        """
+        job["guncelleme"] = time.time()
+        if self.store is None:
+            return
+        document = dict(job, son_kullanma=datetime.utcnow() + timedelta(seconds=expires_in))
+        try:
+            await self.store.replace_one({"_id": job["job_id"]}, document, upsert=True)
+        except Exception as e:
+            logging.error(f"Yoklama işi depoya yazılamadı ({job['job_id']}): {str(e)}")
+
+    async def _create(self, durum):
+        """
+        Sınırı kontrol eder ve yeni bir aktif iş kaydı oluşturur.
+        Sınır yaklaşık uygulanır: eşzamanlı iki istek aynı anda son boş yeri görebilir.
+        """
+        self._prune()
+        if self.active >= self.max_pending or await self.pending() >= self.max_pending:
+            raise QueueFullError("Yoklama kuyruğu dolu.")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "durum": durum,
+            "olusturma": time.time(),
+            "bitis": None,
+            "sonuc": None,
+            "hata": None,
+        }
+        self.jobs[job_id] = job
+        self.active += 1
+        await self._save(job, self.stale_after + self.result_ttl)
+        return job
+
+    async def submit(self, handler, *args):
+        """
+        Yeni bir iş kuyruğa ekler ve iş kimliğini hemen döndürür.
+        handler(queue, *args) bir coroutine olmalıdır; CPU işini run_cpu ile havuza gönderir.
+        """
+        job = await self._create("kuyrukta")
+        task = asyncio.get_running_loop().create_task(self._run(job, handler, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job["job_id"]
+
+    async def open_session(self):
+        """
+        Canlı yoklama oturumunu süresince bir aktif iş olarak sayar; kuyruk doluysa QueueFullError.
+        Oturum touch ile canlı tutulur ve close_session ile kapatılır.
+        """
+        job = await self._create("isleniyor")
+        return job["job_id"]
+
+    async def touch(self, job_id):
+        """
+        Uzun süren oturumun kaydını, eskimiş sayılmaması için ara sıra yeniler.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None and time.time() - job["guncelleme"] > self.stale_after / 3:
+            await self._save(job, self.stale_after + self.result_ttl)
+
+    async def close_session(self, job_id, result=None, error=None):
+        job = self.jobs.get(job_id)
+        if job is None or job["bitis"] is not None:
+            return
+        job["durum"] = "hata" if error else "tamamlandi"
+        job["sonuc"] = result
+        job["hata"] = error
+        job["bitis"] = time.time()
+        self.active -= 1
+        await self._save(job, self.result_ttl)
+
+    async def _run(self, job, handler, args):
+        job["durum"] = "isleniyor"
+        await self._save(job, self.stale_after + self.result_ttl)
+        try:
+            job["sonuc"] = await handler(self, *args)
+            job["durum"] = "tamamlandi"
+        except Exception as e:
+            logging.error(f"Yoklama işi başarısız ({job['job_id']}): {str(e)}")
+            job["durum"] = "hata"
+            job["hata"] = str(e)
+        finally:
+            job["bitis"] = time.time()
+            self.active -= 1
+        await self._save(job, self.result_ttl)
+
+    async def run_cpu(self, fn, *args):
+        """
+        Fonksiyonu süreç havuzunda çalıştırır; fn modül seviyesinde tanımlı olmalıdır.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def get(self, job_id):
+        """
+        İşi önce bu işçinin belleğinde, yoksa ortak depoda arar.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        return await self.store.find_one({"_id": job_id}, {"_id": 0, "son_kullanma": 0})
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,103 @@
+import argparse
+import json
+import threading
+from datetime import datetime
+
+
+class AttendanceRecorder:
+    """
+    Kamera yoklaması için tamponlu kayıt tutucu.
+    Oturumda işaretlenen isimler bellekte tutulur; yeni kayıtlar yalnızca sona eklenen
+    bir JSON Lines dosyasına arka plan iş parçacığında toplu olarak yazılır.
+    """
+
+    def __init__(self, log_path="yoklama.jsonl", flush_interval=2.0, session_id=None):
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.marked = set()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def mark(self, name):
+        """
+        İsmi bu oturumda ilk kez görüyorsa kayda ekler; disk erişimi yapmaz.
+        """
+        if name in self.marked:
+            return False
+        with self._lock:
+            if name in self.marked:
+                return False
+            self.marked.add(name)
+            self._buffer.append({
+                "name": name,
+                "zaman": datetime.now().strftime('%d,%m, %A %H:%M:%S'),
+                "oturum": self.session_id,
+            })
+        return True
+
+    def flush(self):
+        """
+        Tampondaki kayıtları dosyanın sonuna ekler.
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """
+        Arka plan iş parçacığını durdurur ve kalan kayıtları yazar.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_json(log_path, json_path):
+    """
+    JSON Lines kaydını eski yoklama.json düzenine ({"name", "zaman"} listesi) aktarır.
+    Her isim ilk görüldüğü zamanla bir kez yer alır.
+    """
+    data = []
+    seen = set()
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry["name"] in seen:
+                continue
+            seen.add(entry["name"])
+            data.append({"name": entry["name"], "zaman": entry["zaman"]})
+
+    with open(json_path, "w") as file:
+        json.dump(data, file, indent=4)
+    print(f"{len(data)} kayıt {json_path} dosyasına aktarıldı.")
+    return data
+
+
+# Dışa aktarma: python attendance_recorder.py yoklama.jsonl yoklama.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yoklama kaydını yoklama.json biçimine aktarır.")
+    parser.add_argument("log_path", nargs="?", default="yoklama.jsonl")
+    parser.add_argument("json_path", nargs="?", default="yoklama.json")
+    args = parser.parse_args()
+    export_json(args.log_path, args.json_path)
@@ -0,0 +1,176 @@
+import argparse
+import base64
+import os
+from datetime import datetime
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pymongo import MongoClient, UpdateOne
+
+# Sayfa başına döndürülebilecek en fazla kayıt
+MAKS_SAYFA_BOYUTU = 500
+
+
+def encode_cursor(record):
+    """
+    Son kaydın (date, _id) çiftini opak bir imlece çevirir.
+    migrate_dates çalıştırılmamış eski kayıtlarda date metin olabilir; tipi imlece yazılır.
+    """
+    date = record["date"]
+    if isinstance(date, datetime):
+        raw = f"d|{date.isoformat()}|{record['_id']}"
+    else:
+        raw = f"s|{date}|{record['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    İmleci (date, _id) çiftine çevirir; date datetime veya (eski kayıtlarda) metindir.
+    """
+    try:
+        kind, rest = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        date_part, id_part = rest.rsplit("|", 1)
+        date = datetime.fromisoformat(date_part) if kind == "d" else date_part
+        return date, ObjectId(id_part)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci.")
+
+
+class AttendanceResultsService:
+    """
+    Yoklama sonuçlarını (lesson_name, date, _id) indeksi üzerinden sayfalı okur
+    ve panel için sunucu tarafında özet çıkarır.
+    """
+
+    def __init__(self, db):
+        self.collection = db["YoklamaVeritabani"]
+
+    @staticmethod
+    def _date_filter(date_from=None, date_to=None):
+        date_filter = {}
+        if date_from:
+            date_filter["$gte"] = date_from
+        if date_to:
+            date_filter["$lte"] = date_to
+        return date_filter
+
+    def get_results(self, lesson_name, cursor=None, limit=100, date_from=None, date_to=None):
+        """
+        Yeniden eskiye sıralı bir sayfa kayıt ve sonraki sayfanın imlecini döndürür.
+        Metin tarihli eski kayıtlar sayfalamada en sona düşer; tarih aralığı filtresine ise
+        ancak migrate_dates ile dönüştürüldükten sonra girerler.
+        """
+        query = {"lesson_name": lesson_name}
+        date_filter = self._date_filter(date_from, date_to)
+        if date_filter:
+            query["date"] = date_filter
+        if cursor:
+            last_date, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"date": {"$lt": last_date}},
+                {"date": last_date, "_id": {"$lt": last_id}},
+            ]
+            # Azalan sıralamada metin tarihler (BSON tip sırası gereği) tüm datetime'lardan sonra gelir
+            if isinstance(last_date, datetime):
+                query["$or"].append({"date": {"$type": "string"}})
+
+        limit = max(1, min(limit, MAKS_SAYFA_BOYUTU))
+        records = list(self.collection.find(
+            query,
+            {"student_name": 1, "ogrenciNo": 1, "session_id": 1, "date": 1, "status": 1}
+        ).sort([("date", -1), ("_id", -1)]).limit(limit + 1))
+
+        next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+        results = []
+        for record in records[:limit]:
+            record.pop("_id")
+            results.append(record)
+        return {"results": results, "next_cursor": next_cursor}
+
+    def get_summary(self, lesson_name, date_from=None, date_to=None):
+        """
+        Öğrenci bazında katılım oranlarını ve oturum bazında Var/Yok sayılarını döndürür.
+        """
+        match = {"lesson_name": lesson_name}
+        date_filter = self._date_filter(date_from, date_to)
+        if date_filter:
+            match["date"] = date_filter
+
+        is_present = {"$cond": [{"$eq": ["$status", "Var"]}, 1, 0]}
+        # Eski kayıtlarda session_id yok; gün bazında gruplanırlar.
+        # Dönüştürülmemiş metin tarihlerde ("%Y-%m-%d %H:%M:%S") gün, metnin ilk 10 karakteridir
+        day = {"$cond": [
+            {"$eq": [{"$type": "$date"}, "date"]},
+            {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+            {"$substrCP": [{"$toString": "$date"}, 0, 10]},
+        ]}
+        session_key = {"$ifNull": ["$session_id", day]}
+        pipeline = [
+            {"$match": match},
+            {"$facet": {
+                "ogrenciler": [
+                    {"$group": {
+                        "_id": "$ogrenciNo",
+                        "student_name": {"$first": "$student_name"},
+                        "var": {"$sum": is_present},
+                        "toplam": {"$sum": 1},
+                    }},
+                    {"$project": {
+                        "_id": 0,
+                        "ogrenciNo": "$_id",
+                        "student_name": 1,
+                        "var": 1,
+                        "toplam": 1,
+                        "oran": {"$round": [{"$divide": ["$var", "$toplam"]}, 3]},
+                    }},
+                    {"$sort": {"ogrenciNo": 1}},
+                ],
+                "oturumlar": [
+                    {"$group": {
+                        "_id": session_key,
+                        "date": {"$min": "$date"},
+                        "var": {"$sum": is_present},
+                        "toplam": {"$sum": 1},
+                    }},
+                    {"$project": {
+                        "_id": 0,
+                        "session_id": "$_id",
+                        "date": 1,
+                        "var": 1,
+                        "yok": {"$subtract": ["$toplam", "$var"]},
+                    }},
+                    {"$sort": {"date": -1}},
+                ],
+            }},
+        ]
+        return next(self.collection.aggregate(pipeline))
+
+
+def migrate_dates(collection):
+    """
+    Metin olarak saklanan eski "date" alanlarını datetime tipine çevirir.
+    """
+    operations = []
+    for record in collection.find({"date": {"$type": "string"}}, {"date": 1}):
+        try:
+            date = datetime.strptime(record["date"], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+        operations.append(UpdateOne({"_id": record["_id"]}, {"$set": {"date": date}}))
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    print(f"{len(operations)} yoklama kaydının tarihi dönüştürüldü.")
+    return len(operations)
+
+
+# Eski kayıtlar için: python attendance_results.py
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Yoklama tarihlerini datetime tipine dönüştürür.")
+    parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_CLIENT"))
+    db = client[os.getenv("DATABASE_NAME")]
+    migrate_dates(db["YoklamaVeritabani"])
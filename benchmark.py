@@ -0,0 +1,251 @@
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+# Kamera, GPU veya MongoDB gerektirmeyen çevrimdışı kıyaslama.
+# Kullanım:
+#   python benchmark.py --cikti sonuc.json --resim sinif.jpg
+#   python benchmark.py --cikti yeni.json --karsilastir sonuc.json --esik 0.2
+
+
+def time_stage(fn, repeat, warmup=1):
+    """
+    Fonksiyonu warmup + repeat kez çalıştırır ve ms cinsinden özet döndürür.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "medyan_ms": round(statistics.median(samples), 3),
+        "ortalama_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        "tekrar": repeat,
+    }
+
+
+def synthetic_photo(width, height, seed=0):
+    """
+    Fikstür resmi verilmezse kullanılan, doğal görüntüye benzer sentetik JPEG.
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes()
+
+
+def training_variants(photo, count, max_dim=640):
+    """
+    Eğitim kıyaslaması için fikstür fotoğrafından birbirinden farklı count JPEG üretir
+    (yansıtma, parlaklık ve küçük kırpma); yüzler korunduğu için HOG gerçekten yüz bulur.
+    """
+    from image_utils import decode_image, downscale
+    base, _ = downscale(cv2.cvtColor(decode_image(photo), cv2.COLOR_RGB2BGR), max_dim)
+    height, width = base.shape[:2]
+    variants = []
+    for i in range(count):
+        shift = i % 4
+        image = base[shift:height - shift, shift:width - shift]
+        if i % 2:
+            image = cv2.flip(image, 1)
+        image = cv2.convertScaleAbs(image, alpha=1.0 + 0.04 * (i % 5 - 2))
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        variants.append(buffer.tobytes())
+    return variants
+
+
+def fake_face_boxes(width, height, count):
+    """
+    Kodlama aşamasını tespitten bağımsız ölçmek için ızgaraya yerleştirilmiş yüz kutuları.
+    """
+    side = max(40, min(width, height) // 8)
+    columns = max(1, width // (side + 10))
+    boxes = []
+    for i in range(count):
+        top = (i // columns) * (side + 10) % max(1, height - side)
+        left = (i % columns) * (side + 10)
+        boxes.append((top, left + side, top + side, left))
+    return boxes
+
+
+def install_mongo_stand_in():
+    """
+    fastAPI modülü içe aktarılmadan önce pymongo istemcisini mongomock ile değiştirir.
+    """
+    try:
+        import mongomock
+    except ImportError:
+        return False
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ["MONGO_CLIENT"] = "mongodb://localhost:27017"
+    os.environ["DATABASE_NAME"] = "kiyaslama"
+    os.environ["COLLECTION_NAMES"] = "OgretmenBilgileri,OgrenciBilgileri,YoklamaVeritabani,DersName"
+    return True
+
+
+def run_benchmarks(args):
+    import face_recognition
+    from face_embeddings import encode_faces
+    from face_index import synthetic_gallery
+    from face_matcher import FaceGallery, match_faces
+    from image_utils import decode_image, downscale
+
+    results = {}
+    if args.resim:
+        with open(args.resim, "rb") as f:
+            photo = f.read()
+    else:
+        photo = synthetic_photo(args.genislik, args.yukseklik)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(photo).decode()
+    image = decode_image(photo)
+    height, width = image.shape[:2]
+    small_image, _ = downscale(image, args.maks_boyut)
+
+    print(f"Görüntü {width}x{height}, galeri {args.galeri} kişi, sınıf {args.sinif} öğrenci")
+
+    results["base64_decode"] = time_stage(lambda: base64.b64decode(data_url.split(",")[1]), args.tekrar)
+    results["goruntu_yukleme_pil"] = time_stage(lambda: face_recognition.load_image_file(BytesIO(photo)), args.tekrar)
+    results["goruntu_yukleme_cv2"] = time_stage(lambda: decode_image(photo), args.tekrar)
+    results["face_locations"] = time_stage(lambda: face_recognition.face_locations(image), args.agir_tekrar)
+    results["face_locations_kucultulmus"] = time_stage(
+        lambda: face_recognition.face_locations(small_image), args.agir_tekrar)
+    boxes = fake_face_boxes(width, height, args.yuz)
+    results["face_encodings"] = time_stage(
+        lambda: face_recognition.face_encodings(image, known_face_locations=boxes), args.agir_tekrar)
+    results["encode_faces_uctan_uca"] = time_stage(lambda: encode_faces(photo, args.maks_boyut), args.agir_tekrar)
+
+    # Eşleştirme: sentetik galeri, yüz başına bir sorgu
+    vectors, labels, centers = synthetic_gallery(args.galeri, args.foto)
+    gallery = FaceGallery(vectors, [str(label) for label in labels])
+    probes = centers[:args.yuz] + 0.01
+    results["eslestirme_tam"] = time_stage(lambda: match_faces(probes, gallery), args.tekrar)
+    indexed = FaceGallery(vectors, [str(label) for label in labels])
+    indexed.build_index("ivf")
+    results["eslestirme_ivf"] = time_stage(lambda: match_faces(probes, indexed), args.tekrar)
+
+    # Yoklama yazımı: mongomock üzerinde tek bulk_write
+    if install_mongo_stand_in():
+        import fastAPI
+        db = fastAPI.mongo_db.collections
+        db["DersName"].insert_one({"lesson_name": "Kiyaslama", "email": "ogretmen@example.com"})
+        roster = [
+            {"ad": f"Ad{i}", "soyad": f"Soyad{i}", "ogrenciNo": str(i), "lesson_name": ["Kiyaslama"]}
+            for i in range(args.sinif)
+        ]
+        db["OgrenciBilgileri"].insert_many(roster)
+        detected = roster[::2]
+        results["process_attendance"] = time_stage(
+            lambda: fastAPI.face_service.process_attendance("Kiyaslama", detected, "oturum-1"), args.tekrar)
+    else:
+        print("mongomock kurulu değil, process_attendance aşaması atlandı.")
+
+    # Eğitim: geçici klasörde fikstürden türetilmiş görüntüler (ilk çalıştırma ve artımlı tekrar).
+    # Sentetik gürültüde HOG yüz bulmaz ve kodlama hiç ölçülmez; fikstür yoksa aşama atlanır.
+    if args.resim:
+        from simple_facerec import SimpleFacerec
+        workdir = tempfile.mkdtemp(prefix="kiyaslama-")
+        try:
+            images_root = os.path.join(workdir, "images")
+            variants = training_variants(photo, args.egitim_kisi * args.foto)
+            for person in range(args.egitim_kisi):
+                folder = os.path.join(images_root, f"kisi{person}")
+                os.makedirs(folder)
+                for i in range(args.foto):
+                    with open(os.path.join(folder, f"{i}.jpg"), "wb") as f:
+                        f.write(variants[person * args.foto + i])
+            gallery_path = os.path.join(workdir, "galeri")
+            sfr = SimpleFacerec()
+
+            def train_from_scratch():
+                for suffix in (".npy", ".json", ".manifest.json"):
+                    if os.path.exists(gallery_path + suffix):
+                        os.remove(gallery_path + suffix)
+                sfr.load_and_train_model(images_root, gallery_path)
+
+            results["load_and_train_model"] = time_stage(train_from_scratch, args.agir_tekrar, warmup=0)
+            results["load_and_train_model_artimli"] = time_stage(
+                lambda: sfr.load_and_train_model(images_root, gallery_path), args.agir_tekrar)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print("--resim verilmedi, eğitim aşaması atlandı (sentetik görüntüde yüz bulunmaz).")
+
+    return {
+        "meta": {
+            "tarih": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu": os.cpu_count(),
+            "goruntu": [width, height],
+            "parametreler": {key: value for key, value in vars(args).items() if key not in ("cikti", "karsilastir")},
+        },
+        "asamalar": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Medyan süresi taban çizgisine göre eşiği aşan aşamaları döndürür.
+    """
+    regressions = []
+    for stage, stats in current["asamalar"].items():
+        base = baseline["asamalar"].get(stage)
+        if not base:
+            continue
+        ratio = stats["medyan_ms"] / base["medyan_ms"] if base["medyan_ms"] else 1.0
+        marker = "GERİLEME" if ratio > 1 + threshold else ""
+        print(f"{stage:32s} {base['medyan_ms']:>10.3f} -> {stats['medyan_ms']:>10.3f} ms  x{ratio:.2f} {marker}")
+        if marker:
+            regressions.append(stage)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tanıma ve yoklama sıcak yollarının çevrimdışı kıyaslaması.")
+    parser.add_argument("--cikti", default="benchmark_sonuc.json", help="Sonuçların yazılacağı JSON dosyası.")
+    parser.add_argument("--karsilastir", default=None, help="Taban çizgisi JSON dosyası.")
+    parser.add_argument("--esik", type=float, default=0.2, help="İzin verilen göreli yavaşlama (0.2 = %%20).")
+    parser.add_argument("--resim", default=None, help="Sentetik görüntü yerine fikstür fotoğrafı (yüz içermeli; eğitim aşaması için gerekli).")
+    parser.add_argument("--genislik", type=int, default=4000)
+    parser.add_argument("--yukseklik", type=int, default=3000)
+    parser.add_argument("--maks-boyut", type=int, default=1600)
+    parser.add_argument("--yuz", type=int, default=30, help="Karedeki yüz sayısı.")
+    parser.add_argument("--galeri", type=int, default=5000, help="Sentetik galerideki kişi sayısı.")
+    parser.add_argument("--foto", type=int, default=3, help="Kişi başına fotoğraf sayısı.")
+    parser.add_argument("--sinif", type=int, default=300, help="Yoklama yazımındaki öğrenci sayısı.")
+    parser.add_argument("--egitim-kisi", type=int, default=10)
+    parser.add_argument("--tekrar", type=int, default=20)
+    parser.add_argument("--agir-tekrar", type=int, default=3, help="Tespit/kodlama/eğitim aşamaları için tekrar.")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    with open(args.cikti, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Sonuçlar {args.cikti} dosyasına yazıldı.")
+
+    if args.karsilastir:
+        with open(args.karsilastir, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.esik)
+        if regressions:
+            print(f"Gerileme tespit edildi: {', '.join(regressions)}")
+            sys.exit(1)
+        print("Gerileme yok.")
@@ -0,0 +1,72 @@
+import numpy as np
+
+from face_matcher import KODLAMA_BOYUTU, VARSAYILAN_TOLERANS, assign_one_to_one
+
+# Aynı kişiye ait farklı karelerdeki yüzler bu mesafenin altında kümelenir
+VARSAYILAN_KUME_ESIGI = 0.4
+
+
+def cluster_encodings(face_encodings, frame_ids, threshold=VARSAYILAN_KUME_ESIGI):
+    """
+    Birden fazla karedeki yüz kodlamalarını kişi başına kümeler.
+    Tek bağlantılı birleştirme kullanılır; aynı karedeki iki yüz (farklı kişiler
+    oldukları için) hiçbir zaman aynı kümeye düşmez. Küme başına yüz indeksleri döner.
+    """
+    encodings = np.asarray(face_encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU)
+    count = len(encodings)
+    if count == 0:
+        return []
+
+    norms = np.einsum("ij,ij->i", encodings, encodings)
+    distances = np.sqrt(np.maximum(norms[:, None] + norms[None, :] - 2.0 * encodings @ encodings.T, 0.0))
+    first, second = np.triu_indices(count, k=1)
+    close = distances[first, second] <= threshold
+    first, second = first[close], second[close]
+    order = np.argsort(distances[first, second], kind="stable")
+
+    parent = list(range(count))
+    frames = [{frame_ids[i]} for i in range(count)]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for k in order:
+        a, b = find(first[k]), find(second[k])
+        if a == b or frames[a] & frames[b]:
+            continue
+        parent[b] = a
+        frames[a] |= frames[b]
+
+    clusters = {}
+    for i in range(count):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def match_clusters(face_encodings, clusters, gallery, tolerance=VARSAYILAN_TOLERANS):
+    """
+    Her kümeyi (fiziksel kişiyi) galeriyle bir kez eşleştirir.
+    Küme-kişi mesafesi üyelerin medyan mesafesidir; oy sayısı, kişiyi en yakın
+    eşleşme olarak gören üye sayısıdır. Her küme için (etiket, mesafe, oy) döner.
+    """
+    if not clusters:
+        return []
+    if len(gallery) == 0:
+        return [(None, float("inf"), 0)] * len(clusters)
+
+    member_distances = gallery.identity_distances(face_encodings)
+    cluster_distances = np.stack([np.median(member_distances[members], axis=0) for members in clusters])
+    member_best = np.argmin(member_distances, axis=1)
+    assignment = assign_one_to_one(cluster_distances, tolerance)
+
+    results = []
+    for c, i in enumerate(assignment):
+        if i == -1:
+            results.append((None, float(cluster_distances[c].min()), 0))
+        else:
+            votes = int(np.sum(member_best[clusters[c]] == i))
+            results.append((gallery.identities[i], float(cluster_distances[c, i]), votes))
+    return results
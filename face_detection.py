@@ -0,0 +1,176 @@
+import time
+from multiprocessing import shared_memory
+
+import face_recognition
+import numpy as np
+
+from face_embeddings import decode_photo
+from face_quality import filter_faces, report_rejections
+from image_utils import box_iou, decode_image, downscale, sample_video_frames, scale_locations
+
+# Büyük sınıf fotoğraflarında arka sıralardaki küçük yüzleri kaçırmamak için görüntü
+# örtüşen karolara bölünür; her karo süreç havuzunda ayrı ayrı taranır.
+# Görüntü ana süreçte bir kez çözülür ve paylaşılan belleğe konur; işçiler yalnızca
+# blok adını ve karo koordinatlarını alır, JPEG'i yeniden çözmez.
+# Bu modüldeki işçi fonksiyonları süreç havuzunda çalıştırıldığı için modül seviyesindedir.
+
+# Çok küçük karolar tespit kalitesini düşürür ve görev sayısını patlatır
+MIN_KARO_BOYUTU = 256
+
+
+def load_image(image_data, max_dim):
+    """
+    Görüntüyü çözüp küçültür; (görüntü, ölçek, süre) döner.
+    """
+    started = time.perf_counter()
+    image, scale = downscale(decode_image(decode_photo(image_data)), max_dim)
+    return np.ascontiguousarray(image), scale, time.perf_counter() - started
+
+
+def tile_boxes(height, width, tile_size, overlap=0.25):
+    """
+    Görüntüyü kaplayan örtüşen karoları (top, left, bottom, right) olarak döndürür.
+    """
+    step = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (top, left, min(top + tile_size, height), min(left + tile_size, width))
+        for top in starts(height)
+        for left in starts(width)
+    ]
+
+
+def fit_tile_size(height, width, tile_size, max_tiles, overlap=0.25):
+    """
+    Karo sayısı max_tiles'ı aşıyorsa karo boyutunu sınıra sığana kadar büyütür.
+    """
+    while len(tile_boxes(height, width, tile_size, overlap)) > max_tiles and tile_size < max(height, width):
+        tile_size += MIN_KARO_BOYUTU // 4
+    return tile_size
+
+
+class SharedImage:
+    """
+    Çözülmüş görüntüyü işçilerle kopyasız paylaşmak için paylaşılan bellek bloğu.
+    Ana süreç oluşturur ve close() ile siler; işçiler attach_image ile bağlanır.
+    """
+
+    def __init__(self, image):
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        np.ndarray(image.shape, dtype=image.dtype, buffer=self._shm.buf)[:] = image
+        self.shape = image.shape
+        self.descriptor = (self._shm.name, image.shape, image.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def load_shared_image(image_data, max_dim):
+    """
+    Görüntüyü çözüp küçültür ve paylaşılan belleğe kopyalar; (SharedImage, ölçek, süre) döner.
+    Onlarca MB'lık kopya olay döngüsünü bekletmesin diye iş parçacığı havuzunda çağrılır.
+    """
+    started = time.perf_counter()
+    image, scale, _ = load_image(image_data, max_dim)
+    return SharedImage(image), scale, time.perf_counter() - started
+
+
+def load_shared_video_frames(video_bytes, max_frames, max_dim):
+    """
+    Videodan kareleri örnekler ve her birini paylaşılan belleğe kopyalar; (SharedImage listesi, süre) döner.
+    İş parçacığı havuzunda çağrılır; kareler süreç sınırından pickle ile geçmez.
+    """
+    started = time.perf_counter()
+    frames = []
+    try:
+        for frame in sample_video_frames(video_bytes, max_frames, max_dim):
+            frames.append(SharedImage(np.ascontiguousarray(frame)))
+    except BaseException:
+        for shared in frames:
+            shared.close()
+        raise
+    return frames, time.perf_counter() - started
+
+
+def attach_image(descriptor):
+    """
+    İşçi tarafında paylaşılan görüntüye bağlanır; (blok, görüntü) döner.
+    İşçiler ana sürecin kaynak izleyicisini paylaşır; blok yalnızca ana süreçte silinir.
+    """
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def detect_tile(descriptor, tile, upsample=1):
+    """
+    Tek bir karoda yüz arar; konumlar tüm (küçültülmüş) görüntü koordinatlarında döner.
+    """
+    shm, image = attach_image(descriptor)
+    try:
+        top, left, bottom, right = tile
+        started = time.perf_counter()
+        crop = np.ascontiguousarray(image[top:bottom, left:right])
+        locations = face_recognition.face_locations(crop, number_of_times_to_upsample=upsample)
+        elapsed = time.perf_counter() - started
+    finally:
+        del image
+        shm.close()
+    return [(t + top, r + left, b + top, l + left) for t, r, b, l in locations], elapsed
+
+
+def non_max_suppression(face_locations, iou_threshold=0.3):
+    """
+    Karoların örtüşen bölgelerinde iki kez bulunan yüzleri tekilleştirir.
+    Karo kenarında kesilen kutular yerine büyük (tam) kutu tutulur.
+    """
+    ordered = sorted(face_locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True)
+    kept = []
+    for box in ordered:
+        if all(box_iou(box, other) < iou_threshold and not _contains(other, box) for other in kept):
+            kept.append(box)
+    return kept
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[3] <= inner[3] and outer[2] >= inner[2] and outer[1] >= inner[1]
+
+
+def encode_locations(descriptor, scale, face_locations):
+    """
+    Yalnızca NMS'ten ve kalite kontrolünden geçen yüzleri toplu kodlar; konumları orijinal görüntüye taşır.
+    """
+    shm, image = attach_image(descriptor)
+    try:
+        timings = {}
+        accepted, rejections = filter_faces(image, face_locations, timings=timings)
+        rejected = report_rejections(rejections, face_locations, scale)
+        face_locations = [face_locations[i] for i in accepted]
+
+        started = time.perf_counter()
+        face_encodings = face_recognition.face_encodings(image, face_locations) if face_locations else []
+        timings["encode"] = time.perf_counter() - started
+    finally:
+        del image
+        shm.close()
+    return scale_locations(face_locations, scale), face_encodings, timings, rejected
+
+
+def encode_shared_frame(descriptor, upsample=1):
+    """
+    Paylaşılan bellekteki (zaten küçültülmüş) karede yüzleri bulur, kalite kontrolünden geçirip kodlar.
+    encode_faces_timed ile aynı (konumlar, kodlamalar, süreler, reddedilenler) biçiminde döner.
+    """
+    _, shape, _ = descriptor
+    face_locations, detect_seconds = detect_tile(descriptor, (0, 0, shape[0], shape[1]), upsample)
+    face_locations, face_encodings, timings, rejected = encode_locations(descriptor, 1.0, face_locations)
+    timings["detect"] = detect_seconds
+    return face_locations, face_encodings, timings, rejected
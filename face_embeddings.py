@@ -0,0 +1,153 @@
+import argparse
+import base64
+import logging
+import os
+import time
+from datetime import datetime
+from io import BytesIO
+
+import face_recognition
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from face_matcher import KODLAMA_MODELI
+from gallery_cache import bump_gallery_version
+from face_quality import filter_faces, report_rejections
+from image_utils import decode_image, downscale, scale_locations
+from photo_store import PhotoStore, load_photos
+
+# Kodlamaların hangi modelle üretildiğini (KODLAMA_MODELI) öğrenci belgesinde saklarız.
+# Model değişirse backfill komutu eski kodlamaları yeniden üretir.
+
+
+def decode_photo(photo):
+    """
+    data-URL veya düz base64 formatındaki fotoğrafı byte dizisine çevirir.
+    """
+    if isinstance(photo, bytes):
+        return photo
+    if photo.startswith("data:image"):
+        photo = photo.split(",", 1)[1]
+    return base64.b64decode(photo)
+
+
+def encode_photo(photo):
+    """
+    Tek bir fotoğraftaki ilk yüzün 128 boyutlu kodlamasını döndürür.
+    Yüz bulunamazsa None döner.
+    """
+    image = face_recognition.load_image_file(BytesIO(decode_photo(photo)))
+    encodings = face_recognition.face_encodings(image)
+    if not encodings:
+        return None
+    return [float(value) for value in encodings[0]]
+
+
+def encode_faces(image_data, max_dim=None, timings=None, upsample=1, rejected=None, quality=None):
+    """
+    Sınıf fotoğrafındaki tüm yüzlerin konumlarını ve kodlamalarını döndürür.
+    Tespit, uzun kenarı max_dim pikseli aşmayacak şekilde küçültülmüş görüntüde yapılır;
+    konumlar orijinal görüntü koordinatlarına geri taşınır.
+    Kalite kontrolünden (face_quality) geçemeyen yüzler kodlanmaz; rejected listesi verilirse içine eklenir.
+    timings sözlüğü verilirse decode/detect/quality/encode süreleri (saniye) içine yazılır.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    # Videodan örneklenen kareler zaten çözülmüş NumPy dizisi olarak gelir
+    image = image_data if isinstance(image_data, np.ndarray) else decode_image(decode_photo(image_data))
+    small_image, scale = downscale(image, max_dim)
+    timings["decode"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    face_locations = face_recognition.face_locations(small_image, number_of_times_to_upsample=upsample)
+    timings["detect"] = time.perf_counter() - started
+
+    accepted, rejections = filter_faces(small_image, face_locations, quality, timings)
+    if rejected is not None:
+        rejected.extend(report_rejections(rejections, face_locations, scale))
+    face_locations = [face_locations[i] for i in accepted]
+
+    started = time.perf_counter()
+    face_encodings = face_recognition.face_encodings(small_image, face_locations)
+    timings["encode"] = time.perf_counter() - started
+    return scale_locations(face_locations, scale), face_encodings
+
+
+def encode_faces_timed(image_data, max_dim=None, upsample=1):
+    """
+    Süreç havuzu için encode_faces: aşama süreleri ve reddedilen yüzler ana sürece sonuçla birlikte döner.
+    """
+    timings = {}
+    rejected = []
+    face_locations, face_encodings = encode_faces(image_data, max_dim, timings, upsample, rejected)
+    return face_locations, face_encodings, timings, rejected
+
+
+def encode_student_photos(fotograflar):
+    """
+    Öğrencinin tüm fotoğraflarını kodlar; yüz bulunamayan fotoğraflar atlanır.
+    """
+    embeddings = []
+    for index, photo in enumerate(fotograflar):
+        try:
+            encoding = encode_photo(photo)
+        except Exception as e:
+            logging.warning(f"Fotoğraf {index} kodlanamadı: {str(e)}")
+            continue
+        if encoding is None:
+            logging.warning(f"Fotoğraf {index} içinde yüz bulunamadı.")
+            continue
+        embeddings.append(encoding)
+    return embeddings
+
+
+def build_embedding_fields(fotograflar):
+    """
+    Öğrenci belgesine yazılacak kodlama alanlarını hazırlar.
+    """
+    return {
+        "yuz_kodlamalari": encode_student_photos(fotograflar),
+        "kodlama_modeli": KODLAMA_MODELI,
+        "kodlama_tarihi": datetime.now(),
+    }
+
+
+def backfill(collection, counters, store, force=False):
+    """
+    Kodlaması olmayan (veya eski modelle kodlanmış) öğrencileri yeniden kodlar.
+    Fotoğraflar depodan okunur; henüz taşınmamış belgelerde base64 alan kullanılır.
+    Her güncelleme galeri sürümünü artırır; çalışan API önbelleği etkilenen dersleri yeniler.
+    """
+    query = {} if force else {
+        "$or": [
+            {"yuz_kodlamalari": {"$exists": False}},
+            {"kodlama_modeli": {"$ne": KODLAMA_MODELI}},
+        ]
+    }
+    updated = 0
+    for student in collection.find(query, {"ogrenciNo": 1, "fotograflar": 1, "foto_referanslari": 1}):
+        if "foto_referanslari" in student:
+            photos = load_photos(store, student["foto_referanslari"])
+        else:
+            photos = student.get("fotograflar", [])
+        fields = build_embedding_fields(photos)
+        fields["galeri_surumu"] = bump_gallery_version(counters)
+        collection.update_one({"_id": student["_id"]}, {"$set": fields})
+        updated += 1
+        print(f"{student.get('ogrenciNo')}: {len(fields['yuz_kodlamalari'])} kodlama kaydedildi.")
+    print(f"Toplam {updated} öğrenci güncellendi.")
+    return updated
+
+
+# Mevcut kayıtlar için: python face_embeddings.py [--force]
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Öğrenci yüz kodlamalarını doldurur.")
+    parser.add_argument("--force", action="store_true", help="Tüm öğrencileri yeniden kodla.")
+    parser.add_argument("--depo", default=None, help="Fotoğraf deposu klasörü (varsayılan PHOTO_STORE_DIR).")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_CLIENT"))
+    db = client[os.getenv("DATABASE_NAME")]
+    backfill(db["OgrenciBilgileri"], db["SistemSayaclari"], PhotoStore(args.depo), force=args.force)
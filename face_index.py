@@ -0,0 +1,288 @@
+import argparse
+import time
+
+import numpy as np
+
+# face_recognition (dlib) kodlayıcısı; model adı ve kodlama boyutu yalnızca burada tanımlanır.
+# Model değişirse face_embeddings backfill komutu eski kodlamaları yeniden üretir.
+KODLAMA_MODELI = "dlib_face_recognition_resnet_model_v1"
+KODLAMA_BOYUTU = 128
+
+
+def _squared_distances(queries, vectors, vector_norms=None):
+    """
+    (Q x N) kare öklid mesafeleri; tek bir matris çarpımıyla hesaplanır.
+    """
+    if vector_norms is None:
+        vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+    query_norms = np.einsum("ij,ij->i", queries, queries)
+    return np.maximum(query_norms[:, None] + vector_norms[None, :] - 2.0 * queries @ vectors.T, 0.0)
+
+
+def _top_k(squared, keys, k):
+    """
+    Her satır için en yakın k sonucu (mesafe, anahtar) olarak döndürür; eksikler inf/None ile doldurulur.
+    """
+    query_count = squared.shape[0]
+    distances = np.full((query_count, k), np.inf, dtype=np.float32)
+    result_keys = np.full((query_count, k), None, dtype=object)
+    n = squared.shape[1]
+    if n == 0:
+        return distances, result_keys
+    kk = min(k, n)
+    part = np.argpartition(squared, kk - 1, axis=1)[:, :kk] if kk < n else np.tile(np.arange(n), (query_count, 1))
+    for q in range(query_count):
+        order = part[q][np.argsort(squared[q, part[q]], kind="stable")]
+        distances[q, :kk] = np.sqrt(squared[q, order])
+        result_keys[q, :kk] = [keys[i] for i in order]
+    return distances, result_keys
+
+
+class ExactIndex:
+    """
+    Kaba kuvvet (tam) arama; küçük galeriler ve doğruluk karşılaştırması için.
+    """
+
+    kind = "exact"
+
+    def __init__(self, dim=KODLAMA_BOYUTU):
+        self.dim = dim
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.keys = []
+        self._norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", vectors, vectors)])
+        self.keys.extend(keys)
+
+    def remove(self, keys):
+        removed = set(keys)
+        keep = np.array([key not in removed for key in self.keys], dtype=bool)
+        self.vectors, self._norms = self.vectors[keep], self._norms[keep]
+        self.keys = [key for key, kept in zip(self.keys, keep) if kept]
+
+    def search(self, queries, k=10):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        return _top_k(_squared_distances(queries, self.vectors, self._norms), self.keys, k)
+
+    def _state(self):
+        return {}
+
+    def _load_state(self, data):
+        pass
+
+
+class IVFIndex(ExactIndex):
+    """
+    k-means bölümlemeli ters dosya indeksi (IVF). Sorgu yalnızca en yakın n_probe
+    kümedeki satırlarla karşılaştırılır; n_probe arttıkça isabet artar, hız düşer.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim=KODLAMA_BOYUTU, n_lists=64, n_probe=8):
+        super().__init__(dim)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int64)
+        self._lists = None
+
+    def train(self, vectors, iterations=20, seed=0, sample_size=None):
+        """
+        Küme merkezlerini Lloyd k-means ile öğrenir (örneklem üzerinde).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        rng = np.random.default_rng(seed)
+        sample_size = sample_size or 64 * self.n_lists
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        n_lists = min(self.n_lists, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmin(_squared_distances(vectors, centroids), axis=1)
+            for c in range(n_lists):
+                members = vectors[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        self.centroids = centroids
+        self.n_lists = n_lists
+        # Merkezler değişti; mevcut satırlar yeniden atanır
+        self.assignments = self._assign(self.vectors)
+        self._lists = None
+
+    def _assign(self, vectors):
+        if not len(vectors):
+            return np.empty(0, dtype=np.int64)
+        return np.argmin(_squared_distances(vectors, self.centroids), axis=1).astype(np.int64)
+
+    def add(self, keys, vectors):
+        if self.centroids is None:
+            raise ValueError("IVF indeksi eklemeden önce train() ile eğitilmelidir.")
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        super().add(keys, vectors)
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._lists = None
+
+    def remove(self, keys):
+        removed = set(keys)
+        keep = np.array([key not in removed for key in self.keys], dtype=bool)
+        super().remove(keys)
+        self.assignments = self.assignments[keep]
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.n_lists)]
+        return self._lists
+
+    def search(self, queries, k=10, n_probe=None):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        result_keys = np.full((len(queries), k), None, dtype=object)
+        if not len(self.keys) or not len(queries):
+            return distances, result_keys
+
+        lists = self._inverted_lists()
+        nearest_lists = np.argsort(_squared_distances(queries, self.centroids), axis=1)[:, :n_probe]
+        for q, probe_lists in enumerate(nearest_lists):
+            rows = np.concatenate([lists[c] for c in probe_lists])
+            squared = _squared_distances(queries[q:q + 1], self.vectors[rows], self._norms[rows])
+            d, keys = _top_k(squared, [self.keys[r] for r in rows], k)
+            distances[q], result_keys[q] = d[0], keys[0]
+        return distances, result_keys
+
+    def _state(self):
+        return {"centroids": self.centroids, "assignments": self.assignments,
+                "n_lists": self.n_lists, "n_probe": self.n_probe}
+
+    def _load_state(self, data):
+        self.centroids = data["centroids"]
+        self.assignments = data["assignments"]
+        self.n_lists = int(data["n_lists"])
+        self.n_probe = int(data["n_probe"])
+
+
+INDEX_TYPES = {ExactIndex.kind: ExactIndex, IVFIndex.kind: IVFIndex}
+
+
+def default_n_lists(rows):
+    """
+    IVF liste sayısı için varsayılan kural (2 * karekök(satır)); recall raporuyla ayarlanacak tek yer burasıdır.
+    """
+    return max(1, int(np.sqrt(rows)) * 2)
+
+
+def build_index(kind, keys, vectors, centroids=None, **params):
+    """
+    Verilen satırlarla yeni bir indeks oluşturur. IVF için önce eğitilir;
+    daha önce öğrenilmiş merkezler verilirse eğitim atlanır, satırlar yalnızca atanır.
+    IVF'de n_lists verilmezse default_n_lists kullanılır.
+    """
+    if kind == IVFIndex.kind and params.get("n_lists") is None:
+        params["n_lists"] = default_n_lists(len(vectors))
+    index = INDEX_TYPES[kind](**params)
+    if isinstance(index, IVFIndex):
+        if centroids is not None:
+            index.centroids = centroids
+            index.n_lists = len(centroids)
+        else:
+            index.train(vectors)
+    index.add(keys, vectors)
+    return index
+
+
+def save_index(index, path):
+    """
+    İndeksi galeri dosyasının yanına .npz olarak kaydeder (pickle kullanılmaz).
+    """
+    np.savez(path, kind=index.kind, dim=index.dim, vectors=index.vectors, keys=np.array(index.keys), **index._state())
+
+
+def load_index(path):
+    with np.load(path, allow_pickle=False) as data:
+        index = INDEX_TYPES[str(data["kind"])](dim=int(data["dim"]))
+        index._load_state(data)
+        index.vectors = data["vectors"]
+        index._norms = np.einsum("ij,ij->i", index.vectors, index.vectors)
+        index.keys = data["keys"].tolist()
+    return index
+
+
+def evaluate_index(index, queries, k=1, exact=None, n_probe_values=(None,)):
+    """
+    Yaklaşık indeksin tam aramaya göre isabet (recall@k) ve gecikme raporu.
+    """
+    if exact is None:
+        exact = ExactIndex(index.dim)
+        exact.add(index.keys, index.vectors)
+
+    started = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    report = {"tam_arama_ms": round(exact_ms, 4), "sonuclar": []}
+    for n_probe in n_probe_values:
+        started = time.perf_counter()
+        _, found = index.search(queries, k, n_probe=n_probe) if isinstance(index, IVFIndex) else index.search(queries, k)
+        approx_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        hits = sum(len(set(truth[q]) & set(found[q])) for q in range(len(queries)))
+        report["sonuclar"].append({
+            "n_probe": n_probe or getattr(index, "n_probe", None),
+            "recall": round(hits / float(truth.size), 4),
+            "sorgu_ms": round(approx_ms, 4),
+            "hizlanma": round(exact_ms / approx_ms, 2) if approx_ms else None,
+        })
+    return report
+
+
+def synthetic_gallery(identities, photos_per_identity=3, seed=0, spread=0.15):
+    """
+    Kişi başına birkaç fotoğraf içeren sentetik bir kodlama galerisi üretir.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=0.35, size=(identities, KODLAMA_BOYUTU)).astype(np.float32)
+    vectors = np.repeat(centers, photos_per_identity, axis=0)
+    vectors += rng.normal(scale=spread / np.sqrt(KODLAMA_BOYUTU), size=vectors.shape).astype(np.float32)
+    labels = np.repeat(np.arange(identities), photos_per_identity)
+    return vectors, labels, centers
+
+
+# Parametre seçimi: python face_index.py --kisi 20000 --listeler 256 --prob 1 4 8 16
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF indeksinin tam aramaya göre isabet/gecikme raporu.")
+    parser.add_argument("--galeri", default=None, help="Sentetik veri yerine galeri dosyasını kullan.")
+    parser.add_argument("--kisi", type=int, default=20000)
+    parser.add_argument("--foto", type=int, default=3)
+    parser.add_argument("--sorgu", type=int, default=200)
+    parser.add_argument("--listeler", type=int, default=None, help="IVF liste sayısı (varsayılan: 2 * karekök(satır)).")
+    parser.add_argument("--prob", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--k", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    if args.galeri:
+        from gallery_store import load_gallery
+        vectors, _, _ = load_gallery(args.galeri, mmap=False)
+        queries = vectors[rng.choice(len(vectors), min(args.sorgu, len(vectors)), replace=False)]
+        queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    else:
+        vectors, _, centers = synthetic_gallery(args.kisi, args.foto)
+        queries = centers[rng.choice(len(centers), args.sorgu, replace=False)]
+        queries = queries + rng.normal(scale=0.15 / np.sqrt(KODLAMA_BOYUTU), size=queries.shape).astype(np.float32)
+
+    started = time.perf_counter()
+    index = build_index("ivf", list(range(len(vectors))), vectors, n_lists=args.listeler)
+    print(f"{len(vectors)} satır, {index.n_lists} liste; eğitim {time.perf_counter() - started:.2f} sn")
+    report = evaluate_index(index, queries, k=args.k, n_probe_values=args.prob)
+    print(f"Tam arama: {report['tam_arama_ms']} ms/sorgu")
+    for row in report["sonuclar"]:
+        print(f"n_probe={row['n_probe']:>3}  recall@{args.k}={row['recall']:.4f}  {row['sorgu_ms']} ms/sorgu  x{row['hizlanma']}")
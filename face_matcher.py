@@ -0,0 +1,143 @@
+import numpy as np
+
+from face_index import KODLAMA_BOYUTU, KODLAMA_MODELI, build_index
+
+# Bu mesafenin altındaki eşleşmeler kabul edilir (SimpleFacerec ile aynı eşik)
+VARSAYILAN_TOLERANS = 0.5
+
+
+class FaceGallery:
+    """
+    Bir ders (veya kamera modu) için bilinen yüz kodlamaları.
+    Her satır bir fotoğrafa, her etiket bir kişiye (ogrenciNo veya isim) karşılık gelir;
+    aynı kişinin birden fazla fotoğrafı olabilir.
+    """
+
+    def __init__(self, encodings, labels):
+        self.encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU)
+        self.labels = list(labels)
+        if len(self.labels) != len(self.encodings):
+            raise ValueError("Kodlama ve etiket sayıları eşleşmiyor.")
+
+        # Satırları kişiye göre grupla: kişi başına en küçük mesafe reduceat ile tek adımda alınır
+        self.identities = list(dict.fromkeys(self.labels))
+        identity_index = {label: i for i, label in enumerate(self.identities)}
+        row_identity = np.array([identity_index[label] for label in self.labels], dtype=np.int64)
+        self._order = np.argsort(row_identity, kind="stable")
+        self._starts = np.searchsorted(row_identity[self._order], np.arange(len(self.identities)))
+        self._sq_norms = np.einsum("ij,ij->i", self.encodings, self.encodings)
+        self._row_identity = row_identity
+        # Büyük galerilerde tam tarama yerine yaklaşık en yakın komşu indeksi kullanılır
+        self.index = None
+        self._index_rows = None
+        self.index_candidates = 32
+
+    @classmethod
+    def from_students(cls, students, key="ogrenciNo"):
+        """
+        Öğrenci belgelerindeki yuz_kodlamalari alanından galeri oluşturur.
+        """
+        encodings, labels = [], []
+        for student in students:
+            for encoding in student.get("yuz_kodlamalari", []):
+                encodings.append(encoding)
+                labels.append(student[key])
+        return cls(encodings, labels)
+
+    def __len__(self):
+        return len(self.encodings)
+
+    def distance_matrix(self, probe_encodings):
+        """
+        Tüm yüzler ile tüm galeri satırları arasındaki öklid mesafeleri (P x R).
+        """
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU)
+        probe_norms = np.einsum("ij,ij->i", probes, probes)
+        squared = probe_norms[:, None] + self._sq_norms[None, :] - 2.0 * probes @ self.encodings.T
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def attach_index(self, index, row_keys=None):
+        """
+        Eşleştirmede kullanılacak indeksi bağlar. İndeks anahtarları satır numaraları
+        değilse row_keys her satırın anahtarını verir (ör. kaynak dosya yolu).
+        """
+        self.index = index
+        self._index_rows = {key: row for row, key in enumerate(row_keys)} if row_keys is not None else None
+
+    def build_index(self, kind="ivf", **params):
+        """
+        Satır numaralarını anahtar olarak kullanan yeni bir indeks oluşturup bağlar.
+        """
+        self.attach_index(build_index(kind, list(range(len(self))), self.encodings, **params))
+        return self.index
+
+    def _indexed_identity_distances(self, probe_encodings):
+        """
+        Her yüz için yalnızca indeksin döndürdüğü adaylar üzerinden kişi mesafeleri;
+        aday olmayan kişiler inf kalır.
+        """
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU)
+        result = np.full((len(probes), len(self.identities)), np.inf, dtype=np.float32)
+        distances, keys = self.index.search(probes, k=self.index_candidates)
+        for p in range(len(probes)):
+            rows = [key if self._index_rows is None else self._index_rows.get(key) for key in keys[p]]
+            valid = [i for i, row in enumerate(rows) if row is not None]
+            if valid:
+                identity = self._row_identity[[rows[i] for i in valid]]
+                np.minimum.at(result[p], identity, distances[p, valid])
+        return result
+
+    def identity_distances(self, probe_encodings):
+        """
+        Her yüz için kişi başına en küçük mesafe (P x K).
+        """
+        if self.index is not None:
+            return self._indexed_identity_distances(probe_encodings)
+        distances = self.distance_matrix(probe_encodings)
+        if not self.identities or not len(distances):
+            return np.empty((len(distances), len(self.identities)), dtype=np.float32)
+        return np.minimum.reduceat(distances[:, self._order], self._starts, axis=1)
+
+
+def assign_one_to_one(identity_distances, tolerance=VARSAYILAN_TOLERANS):
+    """
+    Eşik altındaki (yüz, kişi) çiftlerini artan mesafeyle açgözlü biçimde eşler;
+    bir kişi en fazla bir yüze atanır. Her yüz için kişi indeksi veya -1 döner.
+    """
+    probe_count = identity_distances.shape[0]
+    assignment = np.full(probe_count, -1, dtype=np.int64)
+    probe_idx, identity_idx = np.nonzero(identity_distances <= tolerance)
+    if not len(probe_idx):
+        return assignment
+
+    order = np.argsort(identity_distances[probe_idx, identity_idx], kind="stable")
+    used_identities = set()
+    for k in order:
+        p, i = probe_idx[k], identity_idx[k]
+        if assignment[p] != -1 or i in used_identities:
+            continue
+        assignment[p] = i
+        used_identities.add(i)
+    return assignment
+
+
+def match_faces(probe_encodings, gallery, tolerance=VARSAYILAN_TOLERANS):
+    """
+    Bir karedeki tüm yüzleri galeriyle tek seferde eşleştirir.
+    Her yüz için (etiket, mesafe) döner; eşleşmeyen yüzlerde etiket None olur.
+    """
+    probe_count = len(probe_encodings)
+    if probe_count == 0:
+        return []
+    if len(gallery) == 0:
+        return [(None, float("inf"))] * probe_count
+
+    distances = gallery.identity_distances(probe_encodings)
+    assignment = assign_one_to_one(distances, tolerance)
+    results = []
+    for p, i in enumerate(assignment):
+        if i == -1:
+            results.append((None, float(distances[p].min())))
+        else:
+            results.append((gallery.identities[i], float(distances[p, i])))
+    return results
@@ -0,0 +1,138 @@
+import os
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from image_utils import scale_locations
+
+# Kodlamadan önce ucuz kalite kontrolü: küçük, bulanık veya belirgin profilden görünen yüzler
+# 128 boyutlu kodlayıcıya gönderilmez; güvenilir eşleşme vermedikleri için hem CPU harcar
+# hem de yanlış "Taninamadi" kayıtları üretirler. Eşikler ortam değişkenleriyle ayarlanır;
+# boyut, kodlanan (küçültülmüş) görüntünün pikseli cinsindendir.
+VARSAYILAN_MIN_BOYUT = 20
+VARSAYILAN_MIN_NETLIK = 25.0
+VARSAYILAN_MAKS_YAW = 0.4
+# Bulanıklık ölçümü ölçekten bağımsız olsun diye yüz kırpıntısı bu boyuta getirilir
+NETLIK_KIRPINTI = 64
+
+# Reddetme nedenleri (metrik etiketleri ve raporlarda kullanılır)
+KUCUK = "kucuk"
+BULANIK = "bulanik"
+PROFIL = "profil"
+# Kamera modunda kodlanmayan yüzlerin etiketi; yoklamaya yazılmaz
+DUSUK_KALITE = "Dusuk Kalite"
+
+
+class QualityThresholds:
+    def __init__(self, min_size=VARSAYILAN_MIN_BOYUT, min_sharpness=VARSAYILAN_MIN_NETLIK, max_yaw=VARSAYILAN_MAKS_YAW, enabled=True):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls):
+        """
+        FACE_QUALITY_GATE=0 kontrolü kapatır; diğer değişkenler eşikleri değiştirir.
+        """
+        return cls(
+            min_size=int(os.getenv("FACE_MIN_SIZE", str(VARSAYILAN_MIN_BOYUT))),
+            min_sharpness=float(os.getenv("FACE_MIN_SHARPNESS", str(VARSAYILAN_MIN_NETLIK))),
+            max_yaw=float(os.getenv("FACE_MAX_YAW", str(VARSAYILAN_MAKS_YAW))),
+            enabled=os.getenv("FACE_QUALITY_GATE", "1") != "0",
+        )
+
+
+def sharpness(gray, location):
+    """
+    Yüz kırpıntısının Laplace varyansı; düşük değer bulanık yüz demektir.
+    """
+    top, right, bottom, left = location
+    crop = gray[max(0, top):bottom, max(0, left):right]
+    if crop.size == 0:
+        return 0.0
+    crop = cv2.resize(crop, (NETLIK_KIRPINTI, NETLIK_KIRPINTI), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var())
+
+
+def yaw_ratio(landmarks):
+    """
+    5 noktalı yer işaretlerinden yatay dönüş tahmini: burun ucunun göz ortasına uzaklığı
+    gözler arası mesafeye bölünür. Önden bakan yüzde ~0, profilde 0.5 ve üzeri.
+    Gözler üst üste düşerse oran ölçülemez ve None döner.
+    """
+    left_eye = np.mean(landmarks["left_eye"], axis=0)
+    right_eye = np.mean(landmarks["right_eye"], axis=0)
+    nose = np.mean(landmarks["nose_tip"], axis=0)
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    if eye_distance == 0:
+        return None
+    return float(abs(nose[0] - (left_eye[0] + right_eye[0]) / 2.0) / eye_distance)
+
+
+def filter_faces(image, face_locations, thresholds=None, timings=None):
+    """
+    Yüzleri sırasıyla boyut, netlik ve poz kontrolünden geçirir (ucuzdan pahalıya).
+    (kabul edilen indeksler, reddedilenler) döner; reddedilen her kayıt
+    {"indeks", "neden", "deger"} içerir. timings verilirse "quality" süresi yazılır.
+    """
+    thresholds = thresholds or QualityThresholds.from_env()
+    started = time.perf_counter()
+    if not thresholds.enabled or not len(face_locations):
+        if timings is not None:
+            timings["quality"] = time.perf_counter() - started
+        return list(range(len(face_locations))), []
+
+    accepted, rejected = [], []
+    gray = None
+    for i, (top, right, bottom, left) in enumerate(face_locations):
+        size = min(bottom - top, right - left)
+        if size < thresholds.min_size:
+            rejected.append({"indeks": i, "neden": KUCUK, "deger": int(size)})
+            continue
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        score = sharpness(gray, face_locations[i])
+        if score < thresholds.min_sharpness:
+            rejected.append({"indeks": i, "neden": BULANIK, "deger": round(score, 1)})
+            continue
+        accepted.append(i)
+
+    # Yer işaretleri yalnızca ilk iki kontrolden geçen yüzler için tek çağrıda hesaplanır
+    if accepted and thresholds.max_yaw:
+        landmarks = face_recognition.face_landmarks(image, [face_locations[i] for i in accepted], model="small")
+        frontal = []
+        for i, points in zip(accepted, landmarks):
+            ratio = yaw_ratio(points)
+            # Ölçülemeyen poz profil sayılır; değer JSON'a null olarak yazılır
+            if ratio is None or ratio > thresholds.max_yaw:
+                rejected.append({"indeks": i, "neden": PROFIL, "deger": round(ratio, 2) if ratio is not None else None})
+            else:
+                frontal.append(i)
+        accepted = frontal
+
+    rejected.sort(key=lambda entry: entry["indeks"])
+    if timings is not None:
+        timings["quality"] = time.perf_counter() - started
+    return accepted, rejected
+
+
+def report_rejections(rejected, face_locations, scale=1.0):
+    """
+    Reddedilenleri konumları orijinal görüntü koordinatlarında olacak şekilde raporlar.
+    """
+    return [
+        {"konum": scale_locations([face_locations[entry["indeks"]]], scale)[0], "neden": entry["neden"], "deger": entry["deger"]}
+        for entry in rejected
+    ]
+
+
+def count_rejections(rejected, counts):
+    """
+    Reddetme nedenlerini bir sayaç sözlüğüne ekler.
+    """
+    for entry in rejected:
+        counts[entry["neden"]] = counts.get(entry["neden"], 0) + 1
+    return counts
@@ -1,19 +1,36 @@
-import pickle
 import base64
-import face_recognition
-from fastapi import FastAPI, HTTPException, Depends, Query, Body
-from Models.BaseModeller import RegisterUser, LoginUsers, ResetPassword, CheckEmail, StudentModel
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Body, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from Models.BaseModeller import RegisterUser, LoginUsers, ResetPassword, CheckEmail, StudentModel, StudentPhotosUpdate, StudentLessonsUpdate
+from face_embeddings import build_embedding_fields, decode_photo, encode_faces_timed
+from photo_store import PhotoStore, store_photos
+from attendance_jobs import AttendanceJobQueue, QueueFullError
+from face_matcher import match_faces
+from face_clustering import cluster_encodings, match_clusters
+from face_detection import MIN_KARO_BOYUTU, load_shared_image, load_shared_video_frames, encode_shared_frame, fit_tile_size, tile_boxes, detect_tile, non_max_suppression, encode_locations
+from face_quality import count_rejections
+from gallery_cache import LessonGalleryCache, bump_gallery_version
+from shared_gallery import SharedGalleryReader
+from attendance_results import AttendanceResultsService
+from live_attendance import FrameSlot, LiveAttendanceSession, encode_unconfirmed
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from motor.motor_asyncio import AsyncIOMotorClient
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
-from io import BytesIO
+import asyncio
+import json
+import math
 import os
+import time
 import logging
+import metrics
 
 # Çevresel değişkenleri yükle
 load_dotenv()
@@ -22,17 +39,90 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "default-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 50
+ATTENDANCE_MAX_DIM = int(os.getenv("ATTENDANCE_MAX_DIM", "1600"))  # Tespitten önce uzun kenar bu değere küçültülür
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+TILED_MAX_DIM = int(os.getenv("TILED_MAX_DIM", "4000"))  # Karolu tespitte kullanılan varsayılan uzun kenar
+TILED_MAX_TILES = int(os.getenv("TILED_MAX_TILES", "64"))  # Tek istekte taranacak en fazla karo; aşılırsa karo boyutu büyütülür
+BURST_MAX_FRAMES = int(os.getenv("BURST_MAX_FRAMES", "20"))  # Seri/video yoklamasında işlenecek en fazla kare
+BURST_MAX_UPLOAD_BYTES = int(os.getenv("BURST_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+LIVE_MAX_DIM = int(os.getenv("LIVE_MAX_DIM", "960"))  # Canlı yoklama karelerinin uzun kenarı
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))  # Sunucu başına en fazla bağlantı
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))  # Sıcak tutulan bağlantılar
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))  # Havuz doluyken bekleme sınırı
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(8, os.cpu_count() or 1))))  # bcrypt iş parçacığı sayısı
 
 # Şifreleme ve OAuth2 ayarları
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt istek başına 100-300 ms CPU harcar; olay döngüsü yerine sınırlı bir havuzda çalışır
+password_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # MongoDB bağlantı sınıfı
 class MongoDB:
     def __init__(self, uri, db_name, collection_names):
-        self.client = MongoClient(uri)
+        # Her komut metrics modülünde sayılır (Mongo gidiş-dönüş sayısı)
+        pool_options = {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "event_listeners": [metrics.MongoCommandCounter()],
+        }
+        # Senkron istemci: süreç/iş parçacığı havuzunda çalışan yüz tanıma ve öğrenci işleri
+        self.client = MongoClient(uri, **pool_options)
         self.db = self.client[db_name]
         self.collections = {name: self.db[name] for name in collection_names}
+        # Asenkron istemci: olay döngüsünde doğrudan beklenen istek yolları (kimlik doğrulama)
+        self.async_client = AsyncIOMotorClient(uri, **pool_options)
+        self.async_db = self.async_client[db_name]
+        self.async_collections = {name: self.async_db[name] for name in collection_names}
+
+    def close(self):
+        self.async_client.close()
+        self.client.close()
+
+    def ensure_indexes(self):
+        """
+        Sık kullanılan sorgular için indeksleri oluşturur (zaten varsa işlem yapılmaz).
+        """
+        attendance = self.db["YoklamaVeritabani"]
+        # Upsert anahtarı benzersiz olmalı; eski (oturumsuz) kayıtlar indeks dışında kalır
+        attendance.create_index(
+            [("lesson_name", 1), ("session_id", 1), ("ogrenciNo", 1)],
+            unique=True,
+            partialFilterExpression={"session_id": {"$exists": True}}
+        )
+        # Sayfalama ve tarih aralığı filtreleri için
+        attendance.create_index([("lesson_name", 1), ("date", -1), ("_id", -1)])
+        students = self.db["OgrenciBilgileri"]
+        students.create_index("lesson_name")
+        # Eşzamanlı iki kayıt aynı numarayı alamasın diye benzersizdir
+        self.ensure_unique_index(students, "ogrenciNo")
+        students.create_index("galeri_surumu")
+        self.db["OgretmenBilgileri"].create_index("email")
+        self.db["DersName"].create_index("email")
+        self.db["DersName"].create_index("lesson_name")
+        # Paylaşılan yoklama işleri: aktif iş sayımı ve son kullanma tarihinde otomatik silme
+        jobs = self.db["YoklamaIsleri"]
+        jobs.create_index([("durum", 1), ("guncelleme", 1)])
+        jobs.create_index("son_kullanma", expireAfterSeconds=0)
+
+    @staticmethod
+    def ensure_unique_index(collection, field):
+        """
+        Alanda benzersiz indeks kurar; önceki benzersiz olmayan indeks değiştirilir.
+        Koleksiyonda çift kayıt varsa hata günlüğe yazılır ve benzersiz olmayan indeks korunur.
+        """
+        name = f"{field}_1"
+        existing = collection.index_information().get(name)
+        if existing and existing.get("unique"):
+            return
+        try:
+            if existing:
+                collection.drop_index(name)
+            collection.create_index(field, unique=True)
+        except OperationFailure as e:
+            logging.error(f"{field} için benzersiz indeks kurulamadı, çift kayıtlar temizlenmeli: {str(e)}")
+            collection.create_index(field)
 
 # JWT yardımcı sınıfı
 class JWTUtility:
@@ -73,106 +163,234 @@ class PasswordUtility:
         """
         return pwd_context.verify(plain_password, hashed_password)
 
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """
+        Şifreyi bcrypt havuzunda hash'ler; olay döngüsü bloklanmaz.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """
+        Şifre doğrulamayı bcrypt havuzunda yapar.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
+
 # Kullanıcı servisi sınıfı
 class UserService:
+    """
+    Öğretmen hesapları; motor (asenkron) koleksiyonlarıyla çalışır.
+    """
+
     def __init__(self, db):
         self.collection = db["OgretmenBilgileri"]
         self.collection_lesson = db["DersName"]
 
-    def register_user(self, name: str, email: str, password: str):
+    async def register_user(self, name: str, email: str, password: str):
         """
         Yeni kullanıcı kaydı.
         """
-        if self.collection.find_one({"email": email}):
+        if await self.collection.find_one({"email": email}, {"_id": 1}):
             raise HTTPException(status_code=400, detail="Bu e-posta zaten kayıtlı.")
-        hashed_password = PasswordUtility.hash_password(password)
-        result = self.collection.insert_one({"name": name, "email": email, "password": hashed_password})
+        hashed_password = await PasswordUtility.hash_password_async(password)
+        result = await self.collection.insert_one({"name": name, "email": email, "password": hashed_password})
         return str(result.inserted_id)
 
-    def login_user(self, email: str, password: str):
+    async def login_user(self, email: str, password: str):
         """
         Kullanıcı girişi ve token oluşturma.
         """
-        user = self.collection.find_one({"email": email})
-        if not user or not PasswordUtility.verify_password(password, user["password"]):
+        user = await self.collection.find_one({"email": email}, {"password": 1})
+        if not user or not await PasswordUtility.verify_password_async(password, user["password"]):
             raise HTTPException(status_code=401, detail="Geçersiz e-posta veya şifre.")
         return JWTUtility.create_access_token({"sub": email})
 
-    def check_email(self, email: str):
+    async def check_email(self, email: str):
         """
         E-posta kontrolü.
         """
-        if not self.collection.find_one({"email": email}):
+        if not await self.collection.find_one({"email": email}, {"_id": 1}):
             raise HTTPException(status_code=404, detail="Bu e-postayla kayıtlı kullanıcı bulunamadı.")
         return True
 
-    def update_password(self, email: str, new_password: str):
+    async def update_password(self, email: str, new_password: str):
         """
         Şifre güncelleme.
         """
-        hashed_password = PasswordUtility.hash_password(new_password)
-        result = self.collection.update_one({"email": email}, {"$set": {"password": hashed_password}})
+        hashed_password = await PasswordUtility.hash_password_async(new_password)
+        result = await self.collection.update_one({"email": email}, {"$set": {"password": hashed_password}})
         if result.modified_count != 1:
             raise HTTPException(status_code=404, detail="E-posta bulunamadı.")
         return True
 
-    def get_lessons_by_teacher(self, teacher_email: str):
+    async def get_lessons_by_teacher(self, teacher_email: str):
         """
         Öğretmene ait dersleri getir.
         """
-        lessons = list(self.collection_lesson.find({"email": teacher_email}, {"_id": 0, "lesson_name": 1}))
-        return lessons
+        cursor = self.collection_lesson.find({"email": teacher_email}, {"_id": 0, "lesson_name": 1})
+        return await cursor.to_list(length=None)
 
-# Yüz tanıma servisi sınıfı
-class FaceRecognitionService:
-    def __init__(self, db):
-        self.db = db
-        with open("face_encodings.pkl", "rb") as file:
-            self.known_face_encodings = pickle.load(file)
+# Öğrenci servisi sınıfı
+class StudentService:
+    def __init__(self, db, photo_store, counters):
+        self.collection = db["OgrenciBilgileri"]
+        self.counters = counters
+        self.photo_store = photo_store
 
-    def detect_students(self, image_data):
+    def store_photos(self, fotograflar):
         """
-        Görüntü üzerinden öğrencileri tespit et.
+        base64 fotoğrafları depoya yazar; belge alanları ve kodlanacak ham byte dizileri döner.
         """
         try:
-            if isinstance(image_data, str) and image_data.startswith("data:image"):
-                image_data = base64.b64decode(image_data.split(",")[1])
-
-            image = face_recognition.load_image_file(BytesIO(image_data))
-            face_encodings = face_recognition.face_encodings(image)
-
-            detected_students = []
-            students = list(self.db["OgrenciBilgileri"].find({}, {"ad": 1, "soyad": 1, "fotograflar": 1, "lesson_name": 1}))
+            photos = [decode_photo(photo) for photo in fotograflar]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Fotoğraf verisi uygun formatta değil.")
+        references, stored = store_photos(self.photo_store, photos)
+        return {"foto_referanslari": references}, stored
 
-            for face_encoding in face_encodings:
-                best_match = None
-                best_distance = float('inf')
-
-                for student in students:
-                    for photo in student.get("fotograflar", []):
-                        photo_data = base64.b64decode(photo.split(",")[1])
-                        photo_image = face_recognition.load_image_file(BytesIO(photo_data))
-                        photo_encodings = face_recognition.face_encodings(photo_image)
+    def add_student(self, student: StudentModel):
+        """
+        Yeni öğrenci kaydı; fotoğraflar depoya yazılır ve ham halleriyle kayıt anında kodlanır.
+        """
+        if self.collection.find_one({"ogrenciNo": student.ogrenciNo}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Bu öğrenci numarası zaten kayıtlı.")
+        document = student.dict(exclude={"fotograflar"})
+        fields, photos = self.store_photos(student.fotograflar)
+        document.update(fields)
+        document.update(build_embedding_fields(photos))
+        document["galeri_surumu"] = bump_gallery_version(self.counters)
+        try:
+            result = self.collection.insert_one(document)
+        except DuplicateKeyError:
+            # Ön kontrolden aynı anda geçen ikinci kayıt benzersiz indekse takılır
+            raise HTTPException(status_code=400, detail="Bu öğrenci numarası zaten kayıtlı.")
+        return str(result.inserted_id), len(document["yuz_kodlamalari"])
 
-                        if not photo_encodings:
-                            continue
+    def ensure_exists(self, ogrenciNo: str):
+        if not self.collection.find_one({"ogrenciNo": ogrenciNo}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Öğrenci bulunamadı.")
 
-                        distance = face_recognition.face_distance([photo_encodings[0]], face_encoding)[0]
-                        if distance < best_distance:
-                            best_distance = distance
-                            best_match = student
+    def update_photos(self, ogrenciNo: str, fotograflar):
+        """
+        Öğrenci fotoğraflarını günceller ve kodlamaları yeniden hesaplar.
+        """
+        # Olmayan öğrenci için fotoğraf yazılmaz ve galeri sürümü harcanmaz
+        self.ensure_exists(ogrenciNo)
+        fields, photos = self.store_photos(fotograflar)
+        fields.update(build_embedding_fields(photos))
+        fields["galeri_surumu"] = bump_gallery_version(self.counters)
+        result = self.collection.update_one(
+            {"ogrenciNo": ogrenciNo},
+            {"$set": fields, "$unset": {"fotograflar": ""}}
+        )
+        if result.matched_count != 1:
+            raise HTTPException(status_code=404, detail="Öğrenci bulunamadı.")
+        return len(fields["yuz_kodlamalari"])
+
+    def get_photo_references(self, ogrenciNo: str):
+        """
+        Öğrencinin fotoğraf referanslarını döndürür (fotoğrafların kendisi değil).
+        """
+        student = self.collection.find_one({"ogrenciNo": ogrenciNo}, {"_id": 0, "foto_referanslari": 1})
+        if student is None:
+            raise HTTPException(status_code=404, detail="Öğrenci bulunamadı.")
+        return student.get("foto_referanslari", [])
 
-                if best_match:
-                    detected_students.append(best_match)
+    def update_lessons(self, ogrenciNo: str, lesson_name):
+        """
+        Öğrencinin kayıtlı olduğu dersleri günceller.
+        """
+        self.ensure_exists(ogrenciNo)
+        result = self.collection.update_one(
+            {"ogrenciNo": ogrenciNo},
+            {"$set": {"lesson_name": lesson_name, "galeri_surumu": bump_gallery_version(self.counters)}}
+        )
+        if result.matched_count != 1:
+            raise HTTPException(status_code=404, detail="Öğrenci bulunamadı.")
+        return True
 
-            return detected_students
-        except Exception as e:
-            logging.error(f"Yüz tanıma sırasında hata: {str(e)}")
-            raise
+# Yüz tanıma servisi sınıfı
+class FaceRecognitionService:
+    def __init__(self, db, counters):
+        self.db = db
+        ann_min_rows = int(os.getenv("ANN_MIN_ROWS", "20000"))
+        shared_dir = os.getenv("GALLERY_SHARED_DIR")
+        if shared_dir:
+            # Çok işçili kurulum: galeri shared_gallery.py yükleyicisinin yayımladığı dosyadan eşlenir
+            self.gallery_cache = SharedGalleryReader(shared_dir, ann_min_rows=ann_min_rows)
+        else:
+            # Ders başına kodlama matrisi önbelleği (bellek bütçesi MB cinsinden)
+            self.gallery_cache = LessonGalleryCache(
+                db["OgrenciBilgileri"],
+                counters,
+                max_bytes=int(os.getenv("GALLERY_CACHE_MB", "256")) * 1024 * 1024,
+                ann_min_rows=ann_min_rows
+            )
+
+    def match_faces_to_students(self, face_encodings, lesson_name):
+        """
+        Her yüz için (öğrenci belgesi veya None, mesafe) döndürür.
+        """
+        metrics.FACES_DETECTED.inc(len(face_encodings))
+        if not len(face_encodings):
+            return []
+        # Galeri yalnızca bu derse kayıtlı öğrencilerden oluşur ve önbellekten gelir
+        with metrics.span("gallery_fetch"):
+            gallery, students_by_no = self.gallery_cache.get(lesson_name)
+        metrics.GALLERY_ROWS.set(len(gallery), lesson=lesson_name)
+        with metrics.span("match"):
+            matches = match_faces(face_encodings, gallery)
+        results = [(students_by_no[ogrenciNo] if ogrenciNo is not None else None, distance) for ogrenciNo, distance in matches]
+        metrics.FACES_MATCHED.inc(sum(1 for student, _ in results if student is not None))
+        return results
+
+    def match_students(self, face_encodings, lesson_name):
+        """
+        Kodlamaları derse kayıtlı öğrencilerle karşılaştır.
+        """
+        return [student for student, _ in self.match_faces_to_students(face_encodings, lesson_name) if student is not None]
 
-    def process_attendance(self, lesson_name, detected_students):
+    def match_burst(self, face_encodings, frame_ids, lesson_name):
+        """
+        Birden fazla karedeki yüzleri kişi başına kümeler ve her kişiyi bir kez eşleştirir.
+        """
+        metrics.FACES_DETECTED.inc(len(face_encodings))
+        if not len(face_encodings):
+            return [], []
+        with metrics.span("cluster"):
+            clusters = cluster_encodings(face_encodings, frame_ids)
+        with metrics.span("gallery_fetch"):
+            gallery, students_by_no = self.gallery_cache.get(lesson_name)
+        metrics.GALLERY_ROWS.set(len(gallery), lesson=lesson_name)
+        with metrics.span("match"):
+            matches = match_clusters(face_encodings, clusters, gallery)
+
+        detected_students = []
+        report = []
+        for members, (ogrenciNo, distance, votes) in zip(clusters, matches):
+            report.append({
+                "ogrenciNo": ogrenciNo,
+                # Galeri boşsa veya indeks aday döndürmediyse mesafe sonsuzdur; JSON'da null yazılır
+                "mesafe": round(distance, 4) if math.isfinite(distance) else None,
+                "oy": votes,
+                "kare_sayisi": len(members),
+            })
+            if ogrenciNo is not None:
+                detected_students.append(students_by_no[ogrenciNo])
+        metrics.FACES_MATCHED.inc(len(detected_students))
+        return detected_students, report
+
+    def lesson_exists(self, lesson_name):
+        return self.db["DersName"].find_one({"lesson_name": lesson_name}, {"_id": 1}) is not None
+
+    def process_attendance(self, lesson_name, detected_students, session_id=None):
         """
         Yoklama işlemi.
+        Tüm sınıf listesi tek bir bulk_write ile (ders, oturum, ogrenciNo) anahtarına upsert edilir;
+        aynı oturum için tekrar gönderilen fotoğraf kayıt çoğaltmaz, yalnızca "Yok" durumunu "Var" yapar.
         """
         try:
             # Ders bilgilerini getir
@@ -184,28 +402,42 @@ class FaceRecognitionService:
             # Bu derse kayıtlı öğrencileri getir
             registered_students = list(self.db["OgrenciBilgileri"].find(
                 {"lesson_name": lesson_name},  # Öğrencinin ders listesinde bu dersin olup olmadığını kontrol et
-                {"ad": 1, "soyad": 1, "ogrenciNo": 1}
+                {"_id": 0, "ad": 1, "soyad": 1, "ogrenciNo": 1}
             ))
-            logging.info(f"Kayıtlı öğrenciler: {registered_students}")
+            if not registered_students:
+                return {"var": 0, "yok": 0}
 
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now = datetime.now()
+            session_id = session_id or now.strftime("%Y-%m-%d")
+            detected_nos = {student["ogrenciNo"] for student in detected_students}
 
-            # Her kayıtlı öğrenci için yoklama durumu belirle
+            operations = []
             for student in registered_students:
-                full_name = f"{student['ad']} {student['soyad']}"
                 ogrenciNo = student["ogrenciNo"]
-                status = "Var" if any(full_name == f"{s['ad']} {s['soyad']}" for s in detected_students) else "Yok"
-                logging.info(f"Yoklama kaydı: {full_name} ({ogrenciNo}), Durum: {status}")
-
-                # Yeni yoklama kaydı ekle
-                self.db["YoklamaVeritabani"].insert_one({
-                    "lesson_name": lesson_name,
-                    "student_name": full_name,
-                    "ogrenciNo": ogrenciNo,
-                    "date": now,
-                    "status": status
-                })
-                logging.info(f"Kayıt başarıyla eklendi: {full_name}, Durum: {status}")
+                update = {
+                    "$setOnInsert": {
+                        "lesson_name": lesson_name,
+                        "session_id": session_id,
+                        "ogrenciNo": ogrenciNo,
+                        "student_name": f"{student['ad']} {student['soyad']}",
+                        "date": now,
+                    }
+                }
+                if ogrenciNo in detected_nos:
+                    update["$set"] = {"status": "Var"}
+                else:
+                    update["$setOnInsert"]["status"] = "Yok"
+                operations.append(UpdateOne(
+                    {"lesson_name": lesson_name, "session_id": session_id, "ogrenciNo": ogrenciNo},
+                    update,
+                    upsert=True
+                ))
+
+            with metrics.span("db_write"):
+                self.db["YoklamaVeritabani"].bulk_write(operations, ordered=False)
+            present = len(detected_nos.intersection(student["ogrenciNo"] for student in registered_students))
+            logging.info(f"Yoklama kaydedildi: {lesson_name} / {session_id}, Var: {present}, Yok: {len(registered_students) - present}")
+            return {"var": present, "yok": len(registered_students) - present}
         except Exception as e:
             logging.error(f"Yoklama işlemi sırasında hata: {str(e)}")
             raise
@@ -222,10 +454,172 @@ mongo_db = MongoDB(
     collection_names=[name.strip() for name in os.getenv("COLLECTION_NAMES", "").split(",") if name.strip()]
 )
 
-user_service = UserService(mongo_db.collections)
-face_service = FaceRecognitionService(mongo_db.collections)  # Yüz tanıma servisini başlat
+user_service = UserService(mongo_db.async_collections)
+# Sayaç koleksiyonu COLLECTION_NAMES listesine bağlı değildir; her kurulumda doğrudan erişilir
+student_service = StudentService(mongo_db.collections, PhotoStore(), mongo_db.db["SistemSayaclari"])
+results_service = AttendanceResultsService(mongo_db.collections)
+face_service = FaceRecognitionService(mongo_db.collections, mongo_db.db["SistemSayaclari"])  # Yüz tanıma servisini başlat
+
+# Yüz tespiti/kodlama için süreç havuzu; dolduğunda yeni istekler 429 alır
+# İş durumları YoklamaIsleri koleksiyonunda paylaşılır; --workers ile çalışırken de
+# durum sorgusu her işçide yanıtlanır ve ATTENDANCE_MAX_PENDING tüm işçilerin toplamıdır
+attendance_jobs = AttendanceJobQueue(
+    workers=int(os.getenv("ATTENDANCE_WORKERS", "2")),
+    max_pending=int(os.getenv("ATTENDANCE_MAX_PENDING", "8")),
+    store=mongo_db.async_db["YoklamaIsleri"]
+)
+
+async def detect_and_encode(jobs, image_data, detection):
+    """
+    Tespit ve kodlamayı süreç havuzunda yapar. tile_size verilirse görüntü örtüşen
+    karolara bölünür, karolar paralel taranır, kutular NMS ile birleştirilir ve yalnızca
+    kalan yüzler toplu kodlanır. Kalite kontrolünü geçemeyen yüzler kodlanmaz, raporda ayrıca listelenir.
+    Konumlar, kodlamalar ve süre raporu döner.
+    """
+    tile_size = detection.get("tile_size") or 0
+    upsample = detection.get("upsample", 1)
+    max_dim = detection.get("max_dim") or (TILED_MAX_DIM if tile_size else ATTENDANCE_MAX_DIM)
+    started = time.perf_counter()
+
+    if not tile_size:
+        face_locations, face_encodings, timings, rejected = await jobs.run_cpu(
+            encode_faces_timed, image_data, max_dim, upsample)
+        tile_count = 1
+    else:
+        # Görüntü bir kez çözülür (cv2 çözümleme sırasında GIL'i bırakır); işçiler paylaşılan bellekten okur
+        shared, scale, decode_seconds = await run_in_threadpool(load_shared_image, image_data, max_dim)
+        height, width = shared.shape[:2]
+        # Boyut ancak çözümden sonra bilinir; sınırı aşan karolama reddedilmez, karo boyutu büyütülür
+        tile_size = fit_tile_size(height, width, tile_size, TILED_MAX_TILES)
+        tiles = tile_boxes(height, width, tile_size)
+        try:
+            detect_started = time.perf_counter()
+            tile_results = await asyncio.gather(*(
+                jobs.run_cpu(detect_tile, shared.descriptor, tile, upsample) for tile in tiles
+            ))
+            detect_wall = time.perf_counter() - detect_started
+            merged = non_max_suppression([location for locations, _ in tile_results for location in locations])
+            face_locations, face_encodings, timings, rejected = await jobs.run_cpu(
+                encode_locations, shared.descriptor, scale, merged)
+        finally:
+            shared.close()
+        timings["decode"] = decode_seconds
+        timings["detect"] = detect_wall
+        timings["detect_cpu"] = sum(seconds for _, seconds in tile_results)
+        tile_count = len(tiles)
+
+    metrics.observe_stages({stage: timings[stage] for stage in ("decode", "detect", "quality", "encode")})
+    metrics.observe_rejections(rejected)
+    report = {
+        "karo_boyutu": tile_size,
+        "istenen_karo_boyutu": detection.get("tile_size") or 0,
+        "karo_sayisi": tile_count,
+        "upsample": upsample,
+        "max_dim": max_dim,
+        "zamanlamalar": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "toplam_sn": round(time.perf_counter() - started, 4),
+        "reddedilen_sayisi": count_rejections(rejected, {}),
+        "reddedilen_yuzler": rejected,
+    }
+    return face_locations, face_encodings, report
+
+async def run_attendance_job(jobs, lesson_name, image_data, session_id=None, detection=None):
+    """
+    Yoklama işi: kodlama süreç havuzunda, eşleştirme ve veritabanı yazımı iş parçacığında yapılır.
+    """
+    face_locations, face_encodings, report = await detect_and_encode(jobs, image_data, detection or {})
+    detected_students = await run_in_threadpool(face_service.match_students, face_encodings, lesson_name)
+    summary = await run_in_threadpool(face_service.process_attendance, lesson_name, detected_students, session_id)
+    return {
+        "yuz_sayisi": len(face_encodings),
+        "yuz_konumlari": face_locations,
+        "tespit": report,
+        "tespit_edilenler": [student["ogrenciNo"] for student in detected_students],
+        **summary,
+    }
+
+async def run_burst_job(jobs, lesson_name, images, video, session_id=None):
+    """
+    Seri yoklama işi: kareler süreç havuzunda paralel kodlanır, yüzler kareler arası
+    kümelenir ve sınıf listesi tek seferde yazılır.
+    """
+    if video is None:
+        frame_results = await asyncio.gather(*(
+            jobs.run_cpu(encode_faces_timed, image, ATTENDANCE_MAX_DIM) for image in images
+        ))
+    else:
+        # Kareler bir kez çözülüp paylaşılan belleğe konur; işçilere yalnızca blok adları gider
+        frames, decode_seconds = await run_in_threadpool(
+            load_shared_video_frames, video, BURST_MAX_FRAMES, ATTENDANCE_MAX_DIM)
+        try:
+            metrics.observe_stages({"decode": decode_seconds})
+            frame_results = await asyncio.gather(*(
+                jobs.run_cpu(encode_shared_frame, frame.descriptor) for frame in frames
+            ))
+        finally:
+            for frame in frames:
+                frame.close()
+
+    face_encodings, frame_ids, rejected_counts = [], [], {}
+    for frame_id, (_, encodings, timings, rejected) in enumerate(frame_results):
+        metrics.observe_stages(timings)
+        metrics.observe_rejections(rejected)
+        count_rejections(rejected, rejected_counts)
+        face_encodings.extend(encodings)
+        frame_ids.extend([frame_id] * len(encodings))
+
+    detected_students, clusters = await run_in_threadpool(
+        face_service.match_burst, face_encodings, frame_ids, lesson_name)
+    summary = await run_in_threadpool(face_service.process_attendance, lesson_name, detected_students, session_id)
+    return {
+        "kare_sayisi": len(frame_results),
+        "yuz_sayisi": len(face_encodings),
+        "kisi_sayisi": len(clusters),
+        "reddedilen_sayisi": rejected_counts,
+        "kumeler": clusters,
+        "tespit_edilenler": [student["ogrenciNo"] for student in detected_students],
+        **summary,
+    }
+
+@app.middleware("http")
+async def measure_latency(request: Request, call_next):
+    """
+    Her isteğin süresini yol şablonu bazında ölçer.
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route is not None else "eslesmeyen",
+            status=status
+        )
+
+@app.on_event("startup")
+def create_indexes():
+    mongo_db.ensure_indexes()
+
+@app.on_event("shutdown")
+def shutdown_attendance_jobs():
+    attendance_jobs.shutdown()
+    password_executor.shutdown(wait=False)
+    mongo_db.close()
 
 # Endpointler
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus biçiminde metrikler.
+    """
+    metrics.QUEUE_DEPTH.set(attendance_jobs.active)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/", response_class=HTMLResponse)
 async def login_page():
     """
@@ -269,31 +663,40 @@ async def get_lessons(teacher_email: str = Query(...)):
     """
     Belirtilen öğretmene ait dersleri getir.
     """
-    lessons = user_service.get_lessons_by_teacher(teacher_email)
+    lessons = await user_service.get_lessons_by_teacher(teacher_email)
     if not lessons:
         raise HTTPException(status_code=404, detail="Bu öğretmen için ders bulunamadı.")
     return lessons
 
 @app.get("/attendance-results")
-async def get_attendance_results(lesson_name: str = Query(...)):
+async def get_attendance_results(
+    lesson_name: str = Query(...),
+    cursor: str = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    date_from: datetime = Query(None),
+    date_to: datetime = Query(None),
+    mode: str = Query("raw")
+):
     """
-    Yoklama sonuçlarını döndür.
+    Yoklama sonuçlarını sayfalı (mode=raw) veya özet (mode=summary) olarak döndür.
     """
-    results = list(mongo_db.collections["YoklamaVeritabani"].find(
-        {"lesson_name": lesson_name}, 
-        {"_id": 0, "student_name": 1, "ogrenciNo": 1, "date": 1, "status": 1}
-    ))
-    if not results:
+    if mode not in ("raw", "summary"):
+        raise HTTPException(status_code=400, detail="mode yalnızca 'raw' veya 'summary' olabilir.")
+    if mode == "summary":
+        return await run_in_threadpool(results_service.get_summary, lesson_name, date_from, date_to)
+
+    page = await run_in_threadpool(results_service.get_results, lesson_name, cursor, limit, date_from, date_to)
+    if not page["results"] and not cursor:
         logging.info(f"No results found for lesson_name: {lesson_name}")
         raise HTTPException(status_code=404, detail="Yoklama sonuçları bulunamadı.")
-    return results
+    return page
 
 @app.post("/register")
 async def register_user(data: RegisterUser):
     """
     Yeni kullanıcı kaydı.
     """
-    user_id = user_service.register_user(data.name, data.email, data.password)
+    user_id = await user_service.register_user(data.name, data.email, data.password)
     return {"message": "Kayıt başarılı!", "user_id": user_id}
 
 @app.post("/login")
@@ -301,7 +704,7 @@ async def login_user(data: LoginUsers):
     """
     Kullanıcı girişi.
     """
-    token = user_service.login_user(data.email, data.password)
+    token = await user_service.login_user(data.email, data.password)
     return {"access_token": token, "token_type": "bearer", "email": data.email}
 
 @app.post("/check-email")
@@ -309,7 +712,7 @@ async def check_email(data: CheckEmail):
     """
     E-posta kontrolü.
     """
-    user_service.check_email(data.email)
+    await user_service.check_email(data.email)
     return {"message": "E-posta bulundu."}
 
 @app.post("/update-password")
@@ -317,20 +720,290 @@ async def update_password(data: ResetPassword):
     """
     Şifre güncelleme işlemi.
     """
-    user_service.update_password(data.email, data.password)
+    await user_service.update_password(data.email, data.password)
     return {"message": "Şifre başarıyla güncellendi."}
 
-@app.post("/attendance")
-async def process_attendance(lesson_name: str = Body(...), image: str = Body(...)):
+@app.post("/students")
+async def add_student(data: StudentModel):
     """
-    Yoklama işlemini başlat.
+    Yeni öğrenci kaydı (yüz kodlamaları burada bir kez hesaplanır).
+    """
+    student_id, encoding_count = await run_in_threadpool(student_service.add_student, data)
+    return {"message": "Öğrenci kaydedildi.", "student_id": student_id, "kodlama_sayisi": encoding_count}
+
+@app.put("/students/{ogrenciNo}/fotograflar")
+async def update_student_photos(ogrenciNo: str, data: StudentPhotosUpdate):
+    """
+    Öğrenci fotoğraflarını güncelle.
+    """
+    encoding_count = await run_in_threadpool(student_service.update_photos, ogrenciNo, data.fotograflar)
+    return {"message": "Fotoğraflar güncellendi.", "kodlama_sayisi": encoding_count}
+
+@app.get("/students/{ogrenciNo}/fotograflar")
+async def list_student_photos(ogrenciNo: str):
+    """
+    Öğrencinin fotoğraf referanslarını ve küçük resim adreslerini listele.
+    """
+    references = await run_in_threadpool(student_service.get_photo_references, ogrenciNo)
+    return [
+        {
+            **reference,
+            "url": f"/students/{ogrenciNo}/fotograflar/{reference['sha256']}",
+            "kucuk_url": f"/students/{ogrenciNo}/fotograflar/{reference['sha256']}?kucuk=true",
+        }
+        for reference in references
+    ]
+
+@app.get("/students/{ogrenciNo}/fotograflar/{sha256}")
+async def get_student_photo(ogrenciNo: str, sha256: str, kucuk: bool = Query(False)):
+    """
+    Öğrenci fotoğrafını (veya küçük resmini) depodan döndür.
+    """
+    references = await run_in_threadpool(student_service.get_photo_references, ogrenciNo)
+    if sha256 not in {reference["sha256"] for reference in references}:
+        raise HTTPException(status_code=404, detail="Fotoğraf bulunamadı.")
+    path = student_service.photo_store.path(sha256, thumbnail=kucuk)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Fotoğraf dosyası bulunamadı.")
+    # İçerik adresli dosyalar değişmez; tarayıcı süresiz önbelleğe alabilir
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.put("/students/{ogrenciNo}/dersler")
+async def update_student_lessons(ogrenciNo: str, data: StudentLessonsUpdate):
+    """
+    Öğrencinin ders kayıtlarını güncelle.
+    """
+    await run_in_threadpool(student_service.update_lessons, ogrenciNo, data.lesson_name)
+    return {"message": "Ders kayıtları güncellendi."}
+
+async def queue_attendance(lesson_name, *job_args, handler=run_attendance_job):
+    """
+    Dersi doğrular ve yoklama işini kuyruğa ekler.
+    """
+    if not await run_in_threadpool(face_service.lesson_exists, lesson_name):
+        raise HTTPException(status_code=404, detail="Ders bulunamadı.")
+
+    try:
+        job_id = await attendance_jobs.submit(handler, lesson_name, *job_args)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=429,
+            detail="Yoklama kuyruğu dolu, lütfen birazdan tekrar deneyin.",
+            headers={"Retry-After": "5"}
+        )
+    return {"message": "Yoklama kuyruğa alındı.", "job_id": job_id, "durum_url": f"/attendance/jobs/{job_id}"}
+
+async def read_upload(request: Request):
+    """
+    Ham (image/jpeg) veya multipart gövdeyi boyut sınırını aşmadan okur.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Formda 'image' dosyası bulunamadı.")
+        image_data = await upload.read(MAX_UPLOAD_BYTES + 1)
+    elif content_type.startswith("image/"):
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                break
+            chunks.append(chunk)
+        image_data = b"".join(chunks)
+    else:
+        raise HTTPException(status_code=415, detail="Yalnızca image/* veya multipart/form-data kabul edilir.")
+
+    if len(image_data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Görsel boyutu sınırı aşıyor.")
+    if not image_data:
+        raise HTTPException(status_code=400, detail="Görsel verisi boş.")
+    return image_data
+
+@app.post("/attendance", status_code=202)
+async def process_attendance(
+    lesson_name: str = Body(...),
+    image: str = Body(...),
+    session_id: str = Body(None),
+    tile_size: int = Body(None, ge=MIN_KARO_BOYUTU, le=4096),
+    upsample: int = Body(1, ge=0, le=3),
+    max_dim: int = Body(None, gt=0)
+):
+    """
+    Yoklama işini kuyruğa ekle (JSON/base64 uyumluluk yolu); sonuç /attendance/jobs/{job_id} üzerinden sorgulanır.
     """
     try:
         image_data = base64.b64decode(image.split(",")[1])
-        detected_students = face_service.detect_students(image_data)
-        face_service.process_attendance(lesson_name, detected_students)
-        return {"message": "Katılım başarıyla kaydedildi."}
-    except IndexError:
+    except (IndexError, ValueError):
         raise HTTPException(status_code=400, detail="Görsel verisi uygun formatta değil.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Beklenmeyen bir hata oluştu: {str(e)}")
+    detection = {"tile_size": tile_size, "upsample": upsample, "max_dim": max_dim}
+    return await queue_attendance(lesson_name, image_data, session_id, detection)
+
+@app.post("/attendance/upload", status_code=202)
+async def upload_attendance(
+    request: Request,
+    lesson_name: str = Query(...),
+    session_id: str = Query(None),
+    tile_size: int = Query(None, ge=MIN_KARO_BOYUTU, le=4096),
+    upsample: int = Query(1, ge=0, le=3),
+    max_dim: int = Query(None, gt=0)
+):
+    """
+    Yoklama işini ikili görsel yüklemesiyle kuyruğa ekle (ham image/jpeg veya multipart).
+    tile_size verilirse büyük fotoğraflar karolara bölünerek taranır.
+    """
+    image_data = await read_upload(request)
+    detection = {"tile_size": tile_size, "upsample": upsample, "max_dim": max_dim}
+    return await queue_attendance(lesson_name, image_data, session_id, detection)
+
+@app.post("/attendance/burst", status_code=202)
+async def burst_attendance(request: Request, lesson_name: str = Query(...), session_id: str = Query(None)):
+    """
+    Aynı oturum için birden fazla fotoğraf ('images' alanları) veya kısa bir video ('video')
+    ile yoklama; her kişi kareler arası tek kez eşleştirilir.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Yalnızca multipart/form-data kabul edilir.")
+    form = await request.form()
+    uploads = [upload for upload in form.getlist("images") if not isinstance(upload, str)]
+    video = form.get("video")
+
+    if len(uploads) > BURST_MAX_FRAMES:
+        # Fazla kareler sessizce atılırsa o karelerdeki öğrenciler "Yok" yazılır
+        raise HTTPException(status_code=413, detail=f"En fazla {BURST_MAX_FRAMES} fotoğraf gönderilebilir.")
+    images, total = [], 0
+    for upload in uploads:
+        images.append(await upload.read(MAX_UPLOAD_BYTES + 1))
+        total += len(images[-1])
+    video_data = None
+    if video is not None and not isinstance(video, str):
+        video_data = await video.read(BURST_MAX_UPLOAD_BYTES + 1)
+        total += len(video_data)
+
+    if total > BURST_MAX_UPLOAD_BYTES or any(len(image) > MAX_UPLOAD_BYTES for image in images):
+        raise HTTPException(status_code=413, detail="Yükleme boyutu sınırı aşıyor.")
+    if not images and not video_data:
+        raise HTTPException(status_code=400, detail="En az bir fotoğraf veya video gönderilmelidir.")
+    if images and video_data:
+        raise HTTPException(status_code=400, detail="Fotoğraflar ve video aynı istekte gönderilemez.")
+
+    return await queue_attendance(lesson_name, images, video_data, session_id, handler=run_burst_job)
+
+@app.get("/attendance/jobs/{job_id}")
+async def get_attendance_job(job_id: str):
+    """
+    Yoklama işinin durumunu ve sonucunu döndür.
+    """
+    job = await attendance_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="İş bulunamadı.")
+    return job
+
+async def recognize_live_frames(websocket: WebSocket, session: LiveAttendanceSession, slot: FrameSlot, job_id):
+    """
+    Canlı oturumun tanıma döngüsü: her seferinde yalnızca en son kare işlenir.
+    Önceki karelerde onaylanan öğrencilerin yüzleri yeniden kodlanmaz.
+    """
+    while True:
+        frame = await slot.get()
+        if frame is None:
+            return
+        await attendance_jobs.touch(job_id)
+        try:
+            locations, encoded_locations, face_encodings, timings, rejected = await attendance_jobs.run_cpu(
+                encode_unconfirmed, frame, LIVE_MAX_DIM, session.confirmed_boxes()
+            )
+        except ValueError:
+            await websocket.send_json({"olay": "hata", "mesaj": "Kare çözümlenemedi."})
+            continue
+        metrics.observe_stages(timings)
+        metrics.observe_rejections(rejected)
+        session.track(locations, encoded_locations)
+        matches = await run_in_threadpool(face_service.match_faces_to_students, face_encodings, session.lesson_name)
+        session.processed += 1
+        for student in session.update(encoded_locations, matches):
+            await websocket.send_json({"olay": "var", **student})
+        await websocket.send_json({
+            "olay": "kare",
+            "yuz_sayisi": len(locations),
+            "kodlanan": len(encoded_locations),
+            "reddedilen": len(rejected),
+            "var_sayisi": len(session.present),
+            "islenen_kare": session.processed,
+            "atlanan_kare": slot.dropped,
+        })
+
+@app.websocket("/ws/attendance/{lesson_name}")
+async def live_attendance(websocket: WebSocket, lesson_name: str, session_id: str = None):
+    """
+    Canlı yoklama oturumu. İstemci ikili JPEG kareler gönderir; sunucu yeni "Var" olan
+    öğrencileri {"olay": "var", ...} olarak bildirir. {"komut": "bitir"} mesajı veya bağlantının
+    kapanması oturumu bitirir ve sınıf listesi tek seferde kaydedilir.
+    Oturum, süresince yoklama kuyruğunda bir aktif iş olarak sayılır; kuyruk doluysa bağlantı 4429 ile kapanır.
+    """
+    await websocket.accept()
+    if not await run_in_threadpool(face_service.lesson_exists, lesson_name):
+        await websocket.send_json({"olay": "hata", "mesaj": "Ders bulunamadı."})
+        await websocket.close(code=4404)
+        return
+    try:
+        job_id = await attendance_jobs.open_session()
+    except QueueFullError:
+        await websocket.send_json({"olay": "hata", "mesaj": "Yoklama kuyruğu dolu, lütfen birazdan tekrar deneyin."})
+        await websocket.close(code=4429)
+        return
+
+    session = LiveAttendanceSession(lesson_name, session_id)
+    slot = FrameSlot()
+    summary = None
+    connected = True
+    try:
+        recognizer = asyncio.create_task(recognize_live_frames(websocket, session, slot, job_id))
+        try:
+            while not recognizer.done():
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    connected = False
+                    break
+                if message.get("bytes"):
+                    if len(message["bytes"]) > MAX_UPLOAD_BYTES:
+                        await websocket.send_json({"olay": "hata", "mesaj": "Kare boyutu sınırı aşıldı."})
+                        continue
+                    slot.put(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        command = json.loads(message["text"]).get("komut")
+                    except (ValueError, AttributeError):
+                        command = None
+                    if command == "bitir":
+                        break
+        finally:
+            slot.close()
+            try:
+                await recognizer
+            except Exception as e:
+                # Socket hâlâ açık olabilir; istemci yine de oturum_kapandi ve kapanış çerçevesini alır
+                logging.error(f"Canlı yoklama tanıma hatası: {str(e)}")
+
+        summary = await run_in_threadpool(
+            face_service.process_attendance, lesson_name, session.present_students(), session.session_id
+        )
+    finally:
+        # Oturum hangi yoldan biterse bitsin kuyruktaki yeri serbest bırakılır
+        await attendance_jobs.close_session(
+            job_id, result=summary, error=None if summary is not None else "Oturum tamamlanamadı."
+        )
+
+    if connected:
+        try:
+            await websocket.send_json({
+                "olay": "oturum_kapandi",
+                "islenen_kare": session.processed,
+                "atlanan_kare": slot.dropped,
+                **summary,
+            })
+            await websocket.close()
+        except (WebSocketDisconnect, RuntimeError):
+            # Tanıma hatası istemcinin kopmasından kaynaklandıysa gönderilecek kimse yoktur
+            pass
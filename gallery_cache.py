@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import ReturnDocument
+
+from face_matcher import FaceGallery
+
+# Öğrenci galerisinin sürüm sayacı bu belge üzerinde tutulur
+GALERI_SAYACI = "ogrenci_galerisi"
+
+
+def bump_gallery_version(counters):
+    """
+    Galeri sürümünü bir artırır ve yeni sürümü döndürür.
+    Öğrencinin fotoğrafları veya ders kaydı her değiştiğinde çağrılmalıdır.
+    """
+    counter = counters.find_one_and_update(
+        {"_id": GALERI_SAYACI},
+        {"$inc": {"surum": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["surum"]
+
+
+class GalleryVersionTracker:
+    """
+    Sürüm sayacı, öğrenci belgesi yazılmadan önce artırılır; bu yüzden belgeler sırasız görünebilir
+    (A sürüm 6'yı alıp yazmayı beklerken B sürüm 7'yi yazmış olabilir). İzleyici yalnızca ardışık
+    sürümler görüldükçe ilerler; gap_timeout saniyeden uzun süre eksik kalan sürüm (yazılamamış veya
+    aynı öğrencinin sonraki güncellemesiyle ezilmiş) terk edilmiş sayılıp atlanır.
+    """
+
+    def __init__(self, version=0, gap_timeout=10.0):
+        self.version = version
+        self.gap_timeout = gap_timeout
+        # self.version'dan büyük olup işlenmiş sürümler
+        self._applied = set()
+        # (eksikler ilk fark edildiğinde sayacın değeri, o an); bu değere kadarki
+        # tüm eksik sürümler birlikte beklenir, ardışık ezilmiş sürümler tek tek beklenmez
+        self._gap = None
+
+    def unseen(self, changed):
+        """
+        galeri_surumu > self.version olan belgelerden henüz işlenmemiş olanları döndürür.
+        """
+        return [student for student in changed if student["galeri_surumu"] not in self._applied]
+
+    def advance(self, current, changed):
+        """
+        İşlenen belgeleri kaydeder ve sürümü sayacın o anki değerine (current) kadar ardışık ilerletir.
+        """
+        self._applied.update(student["galeri_surumu"] for student in changed)
+        while self.version < current:
+            following = self.version + 1
+            if following not in self._applied:
+                now = time.monotonic()
+                if self._gap is None or following > self._gap[0]:
+                    self._gap = (current, now)
+                if now - self._gap[1] < self.gap_timeout:
+                    break
+                logging.warning(f"Galeri sürümü {following} {self.gap_timeout} sn içinde yazılmadı, atlanıyor")
+            self._applied.discard(following)
+            self.version = following
+        return self.version
+
+
+class _GalleryEntry:
+    def __init__(self, gallery, students_by_no):
+        self.gallery = gallery
+        self.students_by_no = students_by_no
+        self.nbytes = gallery.encodings.nbytes + 64 * len(students_by_no)
+        if gallery.index is not None:
+            self.nbytes += gallery.index.vectors.nbytes
+
+
+class LessonGalleryCache:
+    """
+    Ders başına kodlama galerisini bellekte tutan LRU önbellek.
+    Her istekte yalnızca sürüm sayacı okunur; sürüm değiştiyse değişen öğrenciler
+    (küçük bir delta sorgusu) okunup yalnızca etkilenen dersler geçersiz kılınır.
+    """
+
+    def __init__(self, students, counters, max_bytes=256 * 1024 * 1024, ann_min_rows=20000, gap_timeout=10.0):
+        self.students = students
+        self.counters = counters
+        self.max_bytes = max_bytes
+        # Bu satır sayısını aşan ders galerileri için yaklaşık (IVF) indeks kurulur
+        self.ann_min_rows = ann_min_rows
+        # Öğrenilmiş IVF merkezleri geçersiz kılmadan sonra da saklanır; yeniden kurulumda yalnızca atama yapılır
+        self._centroids = {}
+        self._tracker = GalleryVersionTracker(self._current_version(), gap_timeout)
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._tracker.version
+
+    def _current_version(self):
+        counter = self.counters.find_one({"_id": GALERI_SAYACI})
+        return counter["surum"] if counter else 0
+
+    def _sync(self):
+        """
+        Sürüm sayacını kontrol eder ve değişen öğrencilerin derslerini geçersiz kılar.
+        """
+        current = self._current_version()
+        if current <= self.version:
+            return
+
+        changed = list(self.students.find(
+            {"galeri_surumu": {"$gt": self.version}},
+            {"ogrenciNo": 1, "lesson_name": 1, "galeri_surumu": 1}
+        ))
+        # Eksik bir sürüm beklenirken sonrakiler her istekte yeniden okunur; yalnızca yeniler geçersiz kılınır
+        fresh = self._tracker.unseen(changed)
+        changed_nos = {student["ogrenciNo"] for student in fresh}
+        stale = set()
+        for student in fresh:
+            stale.update(student.get("lesson_name", []))
+        for lesson_name, entry in self._entries.items():
+            if changed_nos.intersection(entry.students_by_no):
+                stale.add(lesson_name)
+        for lesson_name in stale:
+            entry = self._entries.get(lesson_name)
+            if entry is not None and entry.gallery.index is not None:
+                self._centroids[lesson_name] = entry.gallery.index.centroids
+            self._evict(lesson_name)
+
+        # Henüz yazılmamış bir güncellemeyi atlamamak için yalnızca ardışık sürümler üzerinden ilerlenir
+        self._tracker.advance(current, fresh)
+        if stale:
+            logging.info(f"Galeri önbelleği güncellendi, geçersiz dersler: {sorted(stale)}")
+
+    def _evict(self, lesson_name):
+        entry = self._entries.pop(lesson_name, None)
+        if entry is not None:
+            self._nbytes -= entry.nbytes
+
+    def _load(self, lesson_name):
+        students = list(self.students.find(
+            {"lesson_name": lesson_name, "yuz_kodlamalari.0": {"$exists": True}},
+            {"ad": 1, "soyad": 1, "ogrenciNo": 1, "yuz_kodlamalari": 1}
+        ))
+        gallery = FaceGallery.from_students(students)
+        if len(gallery) >= self.ann_min_rows:
+            gallery.build_index("ivf", centroids=self._centroids.get(lesson_name))
+        students_by_no = {
+            student["ogrenciNo"]: {key: student[key] for key in ("_id", "ad", "soyad", "ogrenciNo")}
+            for student in students
+        }
+        return _GalleryEntry(gallery, students_by_no)
+
+    def get(self, lesson_name):
+        """
+        Dersin galerisini ve ogrenciNo -> öğrenci sözlüğünü döndürür.
+        """
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(lesson_name)
+            if entry is not None:
+                self._entries.move_to_end(lesson_name)
+                return entry.gallery, entry.students_by_no
+
+            entry = self._load(lesson_name)
+            self._entries[lesson_name] = entry
+            self._nbytes += entry.nbytes
+            # Bellek bütçesi aşılırsa en uzun süredir kullanılmayan dersler atılır
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._evict(oldest)
+            return entry.gallery, entry.students_by_no
+
+    def invalidate(self, lesson_name=None):
+        """
+        Bir dersi (veya tüm önbelleği) elle geçersiz kılar.
+        """
+        with self._lock:
+            if lesson_name is None:
+                self._entries.clear()
+                self._nbytes = 0
+            else:
+                self._evict(lesson_name)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+from face_matcher import KODLAMA_BOYUTU, KODLAMA_MODELI
+
+# Galeri dosya biçimi:
+#   <yol>.npy  -> float32 (N, 128) kodlama matrisi, np.load(mmap_mode='r') ile belleğe eşlenir
+#   <yol>.json -> başlık (biçim sürümü, boyutlar, model) ve satır başına isim indeksleri
+FORMAT_SURUMU = 1
+
+
+def _paths(path):
+    base, ext = os.path.splitext(path)
+    if ext not in (".npy", ".json"):
+        base = path
+    return base + ".npy", base + ".json"
+
+
+def save_gallery(path, encodings, names, extra=None):
+    """
+    Kodlamaları ve isimleri galeri biçiminde kaydeder.
+    Dosyalar önce geçici adla yazılıp yer değiştirilir; okuyucular yarım dosya görmez.
+    """
+    matrix_path, header_path = _paths(path)
+    matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU))
+    if len(names) != len(matrix):
+        raise ValueError("Kodlama ve isim sayıları eşleşmiyor.")
+
+    unique_names = list(dict.fromkeys(names))
+    name_index = {name: i for i, name in enumerate(unique_names)}
+    header = {
+        "surum": FORMAT_SURUMU,
+        "adet": int(matrix.shape[0]),
+        "boyut": int(matrix.shape[1]),
+        "dtype": "float32",
+        "model": KODLAMA_MODELI,
+        "olusturma": datetime.now().isoformat(timespec="seconds"),
+        "isimler": unique_names,
+        "satir_isimleri": [name_index[name] for name in names],
+    }
+    if extra:
+        header.update(extra)
+
+    with open(matrix_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    with open(header_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+    os.replace(matrix_path + ".tmp", matrix_path)
+    os.replace(header_path + ".tmp", header_path)
+    return header
+
+
+def load_gallery(path, mmap=True):
+    """
+    Galeriyi yükler; mmap=True iken matris kopyalanmadan belleğe eşlenir,
+    böylece aynı dosyayı açan süreçler işletim sistemi sayfa önbelleğini paylaşır.
+    (kodlamalar, isimler, başlık) döner.
+    """
+    matrix_path, header_path = _paths(path)
+    with open(header_path, "r", encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("surum") != FORMAT_SURUMU:
+        raise ValueError(f"Desteklenmeyen galeri sürümü: {header.get('surum')}")
+
+    encodings = np.load(matrix_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    if encodings.shape != (header["adet"], header["boyut"]) or encodings.dtype != np.float32:
+        raise ValueError("Galeri matrisi başlık bilgisiyle uyuşmuyor.")
+
+    unique_names = header["isimler"]
+    names = [unique_names[i] for i in header["satir_isimleri"]]
+    return encodings, names, header
+
+
+def gallery_exists(path):
+    return all(os.path.exists(p) for p in _paths(path))
+
+
+def convert_pickle(pickle_path, path):
+    """
+    Eski face_encodings.pkl dosyasını galeri biçimine dönüştürür (tek seferlik).
+    Pickle yalnızca güvenilen, kendi ürettiğimiz dosyalar için açılmalıdır.
+    """
+    with open(pickle_path, "rb") as f:
+        encodings, names = pickle.load(f)
+    header = save_gallery(path, encodings, names)
+    print(f"{header['adet']} kodlama ({len(header['isimler'])} kişi) {_paths(path)[0]} dosyasına yazıldı.")
+    return header
+
+
+# Dönüştürme: python gallery_store.py face_encodings.pkl face_gallery
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="face_encodings.pkl dosyasını galeri biçimine dönüştürür.")
+    parser.add_argument("pickle_path")
+    parser.add_argument("gallery_path")
+    args = parser.parse_args()
+    convert_pickle(args.pickle_path, args.gallery_path)
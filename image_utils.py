@@ -0,0 +1,86 @@
+import tempfile
+
+import cv2
+import numpy as np
+
+
+def decode_image(image_bytes):
+    """
+    JPEG/PNG byte dizisini doğrudan RGB NumPy dizisine çözer.
+    """
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Görsel çözümlenemedi.")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def downscale(image, max_dim):
+    """
+    Uzun kenarı max_dim pikseli aşan görüntüyü küçültür.
+    Küçültülmüş görüntü ve uygulanan ölçek (yeni / orijinal) döner.
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if not max_dim or longest <= max_dim:
+        return image, 1.0
+    scale = max_dim / float(longest)
+    resized = cv2.resize(image, (int(round(width * scale)), int(round(height * scale))), interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+
+def scale_locations(face_locations, scale):
+    """
+    Küçültülmüş görüntüdeki (top, right, bottom, left) kutularını orijinal koordinatlara taşır.
+    """
+    if scale == 1.0:
+        return [tuple(int(v) for v in location) for location in face_locations]
+    return [tuple(int(round(v / scale)) for v in location) for location in face_locations]
+
+
+def box_iou(a, b):
+    """
+    (top, right, bottom, left) biçimindeki iki kutunun kesişim/birleşim oranı.
+    """
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    if intersection == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def sample_video_frames(video_bytes, max_frames, max_dim=None):
+    """
+    Kısa bir video klipten eşit aralıklı en fazla max_frames kare örnekler.
+    Kareler RGB ve (verilmişse) max_dim boyutuna küçültülmüş olarak döner.
+    Video açılamaz veya hiç kare çözülemezse ValueError verir.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as f:
+        f.write(video_bytes)
+        f.flush()
+        cap = cv2.VideoCapture(f.name)
+        try:
+            if not cap.isOpened():
+                raise ValueError("Video açılamadı veya biçimi desteklenmiyor.")
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or max_frames
+            step = max(1, total // max_frames)
+            frames = []
+            index = 0
+            while len(frames) < max_frames:
+                # Atlanan kareler çözülmeden geçilir
+                if not cap.grab():
+                    break
+                if index % step == 0:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                        frames.append(downscale(frame, max_dim)[0])
+                index += 1
+            if not frames:
+                raise ValueError("Videodan hiç kare çözülemedi.")
+            return frames
+        finally:
+            cap.release()
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import face_recognition
+
+from face_embeddings import decode_photo
+from face_quality import filter_faces, report_rejections
+from image_utils import box_iou, decode_image, downscale, scale_locations
+
+# Canlı yoklama oturumu: panel WebSocket üzerinden kamera karelerini akıtır,
+# sunucu her an yalnızca en son kareyi işler ve yeni tanınan öğrencileri anında bildirir.
+# Sınıf listesi oturum kapanırken tek seferde yazılır.
+
+# Önceki karede "Var" işaretlenmiş bir yüzle bu oranda örtüşen yüz yeniden kodlanmaz
+VARSAYILAN_TAKIP_ESIGI = 0.4
+
+
+def encode_unconfirmed(image_data, max_dim, confirmed_boxes, iou_threshold=VARSAYILAN_TAKIP_ESIGI):
+    """
+    Karedeki yüzleri bulur; onaylanmış öğrencilerin son kutularıyla örtüşenleri atlayıp
+    kalanlardan kalite kontrolünü geçenleri kodlar. Süreç havuzunda çalışır.
+    (tüm konumlar, kodlanan konumlar, kodlamalar, süreler, reddedilenler) döner;
+    konumlar orijinal koordinatlardadır.
+    """
+    timings = {}
+    started = time.perf_counter()
+    image, scale = downscale(decode_image(decode_photo(image_data)), max_dim)
+    timings["decode"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    small_locations = face_recognition.face_locations(image)
+    timings["detect"] = time.perf_counter() - started
+
+    locations = scale_locations(small_locations, scale)
+    pending = [
+        i for i, location in enumerate(locations)
+        if all(box_iou(location, box) < iou_threshold for box in confirmed_boxes)
+    ]
+    pending_small = [small_locations[i] for i in pending]
+    accepted, rejections = filter_faces(image, pending_small, timings=timings)
+    rejected = report_rejections(rejections, pending_small, scale)
+    pending = [pending[i] for i in accepted]
+
+    started = time.perf_counter()
+    encodings = face_recognition.face_encodings(image, [small_locations[i] for i in pending]) if pending else []
+    timings["encode"] = time.perf_counter() - started
+    return locations, [locations[i] for i in pending], encodings, timings, rejected
+
+
+class FrameSlot:
+    """
+    Tek kareli bekleme yeri: yeni kare gelince işlenmemiş eski kare atılır.
+    Tanıma geride kalırsa kareler kuyrukta birikmez, yalnızca en yenisi işlenir.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """
+        Sıradaki (en son) kareyi bekler; oturum kapandıysa None döner.
+        """
+        while self._frame is None and not self._closed:
+            self._event.clear()
+            await self._event.wait()
+        if self._closed:
+            return None
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class LiveAttendanceSession:
+    """
+    Bir canlı yoklama oturumunun durumu: "Var" işaretlenen öğrenciler ve son görüldükleri kutular.
+    """
+
+    def __init__(self, lesson_name, session_id=None):
+        self.lesson_name = lesson_name
+        self.session_id = session_id
+        self.present = {}
+        self.boxes = {}
+        self.processed = 0
+        self.started = time.monotonic()
+
+    def confirmed_boxes(self):
+        return list(self.boxes.values())
+
+    def track(self, locations, encoded_locations):
+        """
+        Kodlanmadan atlanan yüzlerin kutularını, örtüştükleri onaylı öğrenciye taşır.
+        """
+        encoded = set(encoded_locations)
+        for location in locations:
+            if location in encoded or not self.boxes:
+                continue
+            ogrenciNo, box = max(self.boxes.items(), key=lambda item: box_iou(location, item[1]))
+            if box_iou(location, box) > 0:
+                self.boxes[ogrenciNo] = location
+
+    def update(self, encoded_locations, matches):
+        """
+        Eşleşme sonuçlarını oturuma işler; ilk kez "Var" olan öğrencileri döndürür.
+        matches: her kodlanan yüz için (öğrenci belgesi veya None, mesafe).
+        """
+        newly_present = []
+        for location, (student, distance) in zip(encoded_locations, matches):
+            if student is None:
+                continue
+            ogrenciNo = student["ogrenciNo"]
+            self.boxes[ogrenciNo] = location
+            if ogrenciNo in self.present:
+                continue
+            self.present[ogrenciNo] = student
+            newly_present.append({
+                "ogrenciNo": ogrenciNo,
+                "ad": student["ad"],
+                "soyad": student["soyad"],
+                "mesafe": round(distance, 4),
+                "sure_sn": round(time.monotonic() - self.started, 1),
+            })
+        return newly_present
+
+    def present_students(self):
+        return list(self.present.values())
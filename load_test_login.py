@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+# Eşzamanlı giriş yük testi. Çalışan bir sunucuya karşı kullanılır:
+#   uvicorn fastAPI:app --port 8000
+#   python load_test_login.py --url http://localhost:8000 --eszamanli 50 --istek 500 --cikti once.json
+#   python load_test_login.py --url http://localhost:8000 --eszamanli 50 --istek 500 --karsilastir once.json
+# Giriş fırtınası sürerken /metrics ayrıca yoklanır; bu ucun gecikmesi olay döngüsünün
+# bcrypt veya senkron veritabanı çağrılarıyla ne kadar bloklandığını gösterir.
+
+
+def summarize(samples):
+    """
+    ms cinsinden gecikme örneklerinin özeti.
+    """
+    if not samples:
+        return {"adet": 0}
+    samples = sorted(samples)
+    return {
+        "adet": len(samples),
+        "medyan_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 2),
+        "maks_ms": round(samples[-1], 2),
+    }
+
+
+async def ensure_user(client, email, password):
+    """
+    Test kullanıcısını kaydeder; zaten varsa hata yok sayılır.
+    """
+    response = await client.post("/register", json={"name": "Yuk Testi", "email": email, "password": password})
+    if response.status_code not in (200, 400):
+        raise RuntimeError(f"Test kullanıcısı oluşturulamadı: {response.status_code} {response.text}")
+
+
+async def login_worker(client, queue, email, password, latencies, errors):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        try:
+            response = await client.post("/login", json={"email": email, "password": password})
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def probe_loop(client, stop, latencies, interval):
+    """
+    Hafif bir ucu periyodik olarak çağırarak olay döngüsü gecikmesini ölçer.
+    """
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/metrics")
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.eszamanli + 1, max_keepalive_connections=args.eszamanli + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.zaman_asimi, limits=limits) as client:
+        await ensure_user(client, args.email, args.sifre)
+
+        queue = asyncio.Queue()
+        for i in range(args.istek):
+            queue.put_nowait(i)
+        login_latencies, probe_latencies, errors = [], [], []
+        stop = asyncio.Event()
+
+        probe = asyncio.create_task(probe_loop(client, stop, probe_latencies, args.yoklama_araligi))
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            login_worker(client, queue, args.email, args.sifre, login_latencies, errors)
+            for _ in range(args.eszamanli)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    return {
+        "url": args.url,
+        "eszamanli": args.eszamanli,
+        "istek": args.istek,
+        "sure_sn": round(elapsed, 3),
+        "giris_per_sn": round(len(login_latencies) / elapsed, 2) if elapsed else 0.0,
+        "giris": summarize(login_latencies),
+        "hata": len(errors),
+        "hata_ornekleri": sorted({str(e) for e in errors})[:5],
+        "metrics_yoklamasi": summarize(probe_latencies),
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"{report['istek']} giriş, {report['eszamanli']} eşzamanlı: {report['sure_sn']} sn, "
+          f"{report['giris_per_sn']} giriş/sn, {report['hata']} hata")
+    print(f"  giriş gecikmesi   : {report['giris']}")
+    print(f"  /metrics gecikmesi: {report['metrics_yoklamasi']}")
+    if baseline:
+        ratio = report["giris_per_sn"] / baseline["giris_per_sn"] if baseline["giris_per_sn"] else float("inf")
+        print(f"  taban çizgisi     : {baseline['giris_per_sn']} giriş/sn -> {report['giris_per_sn']} giriş/sn (x{ratio:.2f})")
+        print(f"  /metrics p95      : {baseline['metrics_yoklamasi'].get('p95_ms')} ms -> "
+              f"{report['metrics_yoklamasi'].get('p95_ms')} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eşzamanlı öğretmen girişi altında /login verimini ölçer.")
+    parser.add_argument("--url", default="http://localhost:8000", help="Sunucu adresi.")
+    parser.add_argument("--eszamanli", type=int, default=50, help="Aynı anda açık giriş isteği sayısı.")
+    parser.add_argument("--istek", type=int, default=500, help="Toplam giriş isteği.")
+    parser.add_argument("--email", default="yuktesti@example.com", help="Test kullanıcısının e-postası.")
+    parser.add_argument("--sifre", default="YukTesti123!", help="Test kullanıcısının şifresi.")
+    parser.add_argument("--zaman-asimi", type=float, default=60.0, help="İstek zaman aşımı (sn).")
+    parser.add_argument("--yoklama-araligi", type=float, default=0.05, help="/metrics yoklama aralığı (sn).")
+    parser.add_argument("--cikti", default=None, help="Sonuçların yazılacağı JSON dosyası.")
+    parser.add_argument("--karsilastir", default=None, help="Önceki çalıştırmanın JSON dosyası.")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.karsilastir:
+        with open(args.karsilastir, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.cikti:
+        with open(args.cikti, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Sonuçlar {args.cikti} dosyasına yazıldı.")
+    if report["hata"] and not report["giris"]["adet"]:
+        sys.exit(1)
@@ -0,0 +1,164 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Aşama gecikmeleri için saniye cinsinden histogram sınırları
+VARSAYILAN_SINIRLAR = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = [(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=VARSAYILAN_SINIRLAR):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', repr(bound))])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Tüm metrikleri Prometheus metin biçiminde döndürür.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP istek süresi.", ("method", "route", "status")))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "yoklama_asama_suresi_seconds", "Yoklama aşamalarının süresi (decode, detect, quality, encode, gallery_fetch, match, db_write).",
+    ("stage",)))
+FACES_DETECTED = REGISTRY.register(Counter("yoklama_tespit_edilen_yuz_total", "Tespit edilen yüz sayısı."))
+FACES_MATCHED = REGISTRY.register(Counter("yoklama_eslesen_yuz_total", "Bir öğrenciyle eşleşen yüz sayısı."))
+FACES_REJECTED = REGISTRY.register(Counter(
+    "yoklama_reddedilen_yuz_total", "Kalite kontrolünde reddedilip kodlanmayan yüz sayısı (kucuk, bulanik, profil).", ("neden",)))
+GALLERY_ROWS = REGISTRY.register(Gauge("yoklama_galeri_satir", "Son kullanılan ders galerisindeki kodlama sayısı.", ("lesson",)))
+QUEUE_DEPTH = REGISTRY.register(Gauge("yoklama_kuyruk_derinligi", "Kuyrukta veya işlenmekte olan yoklama işleri."))
+MONGO_COMMANDS = REGISTRY.register(Counter(
+    "mongo_komut_total", "MongoDB gidiş-dönüş sayısı.", ("command", "result")))
+
+
+@contextmanager
+def span(stage):
+    """
+    Bir aşamanın süresini ölçer: with span("match"): ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage)
+
+
+def observe_stages(timings):
+    """
+    Başka bir süreçte ölçülmüş aşama sürelerini ({aşama: saniye}) kaydeder.
+    """
+    for stage, seconds in timings.items():
+        STAGE_LATENCY.observe(seconds, stage=stage)
+
+
+def observe_rejections(rejected):
+    """
+    Kalite kontrolünde reddedilen yüzleri nedenlerine göre sayar.
+    """
+    for entry in rejected:
+        FACES_REJECTED.inc(neden=entry["neden"])
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """
+    pymongo komut olaylarını sayar; MongoClient(event_listeners=[...]) ile bağlanır.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, result="ok")
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, result="hata")
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+import cv2
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from image_utils import decode_image, downscale
+
+# Öğrenci fotoğrafları OgrenciBilgileri belgelerinde base64 olarak değil, içerik adresli
+# dosya deposunda tutulur. Belgede yalnızca SHA-256 özeti ve boyut bilgisi (foto_referanslari) kalır.
+# Aynı fotoğraf iki kez yüklenirse tek dosya olarak saklanır.
+VARSAYILAN_DEPO = "foto_deposu"
+KUCUK_BOYUT = 160  # Arayüz küçük resimlerinin uzun kenarı
+OZET_DESENI = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PhotoStore:
+    def __init__(self, root=None, thumb_dim=None):
+        # Ortam değişkenleri load_dotenv çağrısından sonra okunsun diye burada çözülür
+        self.root = root or os.getenv("PHOTO_STORE_DIR", VARSAYILAN_DEPO)
+        self.thumb_dim = thumb_dim or int(os.getenv("PHOTO_THUMB_DIM", str(KUCUK_BOYUT)))
+
+    def path(self, sha256, thumbnail=False):
+        """
+        Özetin disk yolunu döndürür; geçersiz özet (yol enjeksiyonu) ValueError verir.
+        """
+        if not OZET_DESENI.match(sha256 or ""):
+            raise ValueError("Geçersiz fotoğraf özeti.")
+        folder = "kucuk" if thumbnail else "orijinal"
+        return os.path.join(self.root, folder, sha256[:2], sha256 + ".jpg")
+
+    def exists(self, sha256, thumbnail=False):
+        return os.path.exists(self.path(sha256, thumbnail))
+
+    def put(self, data):
+        """
+        Fotoğrafı (byte dizisi) ve küçük resmini saklar; belgeye yazılacak referansı döndürür.
+        Görsel çözülemezse ValueError verir.
+        """
+        image = decode_image(data)
+        height, width = image.shape[:2]
+        sha256 = hashlib.sha256(data).hexdigest()
+        if not self.exists(sha256):
+            self._write(self.path(sha256), data)
+        if not self.exists(sha256, thumbnail=True):
+            self._write(self.path(sha256, thumbnail=True), self.make_thumbnail(image))
+        return {"sha256": sha256, "bayt": len(data), "genislik": width, "yukseklik": height}
+
+    def read(self, sha256, thumbnail=False):
+        with open(self.path(sha256, thumbnail), "rb") as f:
+            return f.read()
+
+    def make_thumbnail(self, image):
+        """
+        RGB görüntüden arayüz için küçültülmüş JPEG üretir.
+        """
+        small, _ = downscale(image, self.thumb_dim)
+        ok, buffer = cv2.imencode(".jpg", cv2.cvtColor(small, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            raise ValueError("Küçük resim oluşturulamadı.")
+        return buffer.tobytes()
+
+    def _write(self, path, data):
+        # Eşzamanlı yüklemelerde yarım dosya görünmemesi için geçici dosya + atomik yeniden adlandırma
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def store_photos(store, photos):
+    """
+    Byte dizisi fotoğrafları depoya yazar; (referanslar, saklanan byte dizileri) döner.
+    Çözülemeyen fotoğraflar atlanır.
+    """
+    references = []
+    stored = []
+    for index, data in enumerate(photos):
+        try:
+            references.append(store.put(data))
+        except ValueError as e:
+            logging.warning(f"Fotoğraf {index} saklanamadı: {str(e)}")
+            continue
+        stored.append(data)
+    return references, stored
+
+
+def load_photos(store, references):
+    """
+    Referansları depodan okur; eksik dosyalar atlanır.
+    """
+    photos = []
+    for reference in references:
+        try:
+            photos.append(store.read(reference["sha256"]))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Fotoğraf {reference.get('sha256')} okunamadı: {str(e)}")
+    return photos
+
+
+def migrate_photos(collection, store, dry_run=False):
+    """
+    Belgelerde base64 olarak duran fotoğrafları depoya taşır ve fotograflar alanını kaldırır.
+    Çözülemeyen fotoğraflar (GIF, HEIC, bozuk veri) silinmez; olduğu gibi
+    tasinamayan_fotograflar alanında kalır. Kodlamalar değişmediği için galeri sürümü artırılmaz.
+    """
+    from face_embeddings import decode_photo
+
+    migrated = 0
+    failed_total = 0
+    cursor = collection.find({"fotograflar": {"$exists": True}}, {"ogrenciNo": 1, "fotograflar": 1})
+    for student in cursor:
+        ogrenciNo = student.get("ogrenciNo")
+        references, failed = [], []
+        for index, photo in enumerate(student.get("fotograflar") or []):
+            try:
+                data = decode_photo(photo)
+                if dry_run:
+                    decode_image(data)
+                else:
+                    references.append(store.put(data))
+            except ValueError as e:
+                logging.warning(f"{ogrenciNo}: fotoğraf {index} taşınamadı: {str(e)}")
+                failed.append((index, photo, str(e)))
+        failed_total += len(failed)
+        migrated += 1
+
+        if dry_run:
+            total = len(student.get("fotograflar") or [])
+            print(f"{ogrenciNo}: {total - len(failed)} fotoğraf taşınacak, {len(failed)} taşınamayacak.")
+            for index, _, reason in failed:
+                print(f"  fotoğraf {index}: {reason}")
+            continue
+
+        update = {"$set": {"foto_referanslari": references}, "$unset": {"fotograflar": ""}}
+        if failed:
+            update["$set"]["tasinamayan_fotograflar"] = [photo for _, photo, _ in failed]
+        collection.update_one({"_id": student["_id"]}, update)
+        print(f"{ogrenciNo}: {len(references)} fotoğraf depoya taşındı, {len(failed)} fotoğraf tasinamayan_fotograflar alanında bırakıldı.")
+    print(f"Toplam {migrated} öğrenci işlendi, {failed_total} fotoğraf taşınamadı.")
+    return migrated
+
+
+# Mevcut kayıtlar için: python photo_store.py [--depo foto_deposu] [--deneme]
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Öğrenci fotoğraflarını belgelerden dosya deposuna taşır.")
+    parser.add_argument("--depo", default=None, help="Fotoğraf deposu klasörü (varsayılan PHOTO_STORE_DIR).")
+    parser.add_argument("--deneme", action="store_true", help="Hiçbir şey yazmadan taşınacakları listele.")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_CLIENT"))
+    db = client[os.getenv("DATABASE_NAME")]
+    migrate_photos(db["OgrenciBilgileri"], PhotoStore(args.depo), dry_run=args.deneme)
@@ -0,0 +1,201 @@
+import threading
+import time
+
+import cv2
+
+from face_quality import DUSUK_KALITE
+from image_utils import box_iou
+
+
+def create_cv_tracker():
+    """
+    Kurulu OpenCV sürümünde bulunan en hafif takipçiyi oluşturur; yoksa None döner.
+    """
+    for owner, factory in (("legacy", "TrackerMOSSE_create"), (None, "TrackerKCF_create"), ("legacy", "TrackerKCF_create")):
+        module = getattr(cv2, owner, None) if owner else cv2
+        if module is not None and hasattr(module, factory):
+            return getattr(module, factory)()
+    return None
+
+
+class FrameGrabber:
+    """
+    Kamerayı (veya video dosyasını) ayrı bir iş parçacığında okur ve yalnızca en son kareyi tutar.
+    Canlı kamerada işlenemeyen eski kareler atılır; video dosyasında her kare sırayla işlenir.
+    """
+
+    def __init__(self, source=0, drop_frames=True, width=None, height=None):
+        self.cap = cv2.VideoCapture(source)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.drop_frames = drop_frames
+        self.dropped = 0
+        self.stopped = False
+        self._frame = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped:
+            ret, frame = self.cap.read()
+            with self._cond:
+                if not ret:
+                    self.stopped = True
+                    self._cond.notify_all()
+                    break
+                if not self.drop_frames:
+                    # Video dosyası: tüketici önceki kareyi alana kadar bekle
+                    self._cond.wait_for(lambda: self._frame is None or self.stopped)
+                elif self._frame is not None:
+                    self.dropped += 1
+                self._frame = frame
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        En son kareyi döndürür; kaynak bittiyse None döner.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame is not None or self.stopped, timeout)
+            frame, self._frame = self._frame, None
+            self._cond.notify_all()
+            return frame
+
+    def release(self):
+        with self._cond:
+            self.stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+class FaceTrack:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = tuple(int(v) for v in box)  # (top, right, bottom, left)
+        self.name = None  # Henüz tanınmadı
+        self.missed = 0
+        self.tracker = None
+
+
+class FaceTracker:
+    """
+    Tespit karelerinde kutuları IoU ile mevcut izlere bağlar; aradaki karelerde
+    (varsa) OpenCV takipçileriyle kutuları günceller.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=2, use_cv_trackers=True):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.use_cv_trackers = use_cv_trackers
+        self.tracks = []
+        self._next_id = 0
+
+    def _init_cv_tracker(self, track, frame):
+        if not self.use_cv_trackers:
+            return
+        track.tracker = create_cv_tracker()
+        if track.tracker is not None:
+            top, right, bottom, left = track.box
+            track.tracker.init(frame, (left, top, right - left, bottom - top))
+
+    def update(self, boxes, frame):
+        """
+        Yeni tespitleri izlerle eşler. Tanınması gereken (yeni veya henüz tanınmamış)
+        izleri, tespit indeksleriyle birlikte döndürür.
+        """
+        pairs = sorted(
+            ((box_iou(track.box, box), t, d) for t, track in enumerate(self.tracks) for d, box in enumerate(boxes)),
+            reverse=True
+        )
+        matched_tracks, matched_boxes = {}, set()
+        for iou, t, d in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks[t] = d
+            matched_boxes.add(d)
+
+        pending = []
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t in matched_tracks:
+                d = matched_tracks[t]
+                track.box = tuple(int(v) for v in boxes[d])
+                track.missed = 0
+                self._init_cv_tracker(track, frame)
+                if track.name is None or track.name == "Taninamadi":
+                    pending.append((track, d))
+                survivors.append(track)
+            else:
+                track.missed += 1
+                if track.missed <= self.max_missed:
+                    survivors.append(track)
+
+        for d, box in enumerate(boxes):
+            if d in matched_boxes:
+                continue
+            track = FaceTrack(self._next_id, box)
+            self._next_id += 1
+            self._init_cv_tracker(track, frame)
+            survivors.append(track)
+            pending.append((track, d))
+
+        self.tracks = survivors
+        return pending
+
+    def predict(self, frame):
+        """
+        Tespit yapılmayan karelerde kutuları takipçilerle ilerletir.
+        """
+        for track in self.tracks:
+            if track.tracker is None:
+                continue
+            ok, (x, y, w, h) = track.tracker.update(frame)
+            if ok:
+                track.box = (int(y), int(x + w), int(y + h), int(x))
+
+
+class RecognitionPipeline:
+    """
+    Her N karede bir tam tespit yapar; yalnızca yeni veya tanınmamış izler için
+    kodlama ve eşleştirme çalıştırır, aradaki karelerde yalnızca izleri günceller.
+    """
+
+    def __init__(self, sfr, detect_every=5, use_cv_trackers=True):
+        self.sfr = sfr
+        self.detect_every = max(1, detect_every)
+        self.tracker = FaceTracker(use_cv_trackers=use_cv_trackers)
+        self.frame_index = 0
+        self.stats = {"kare": 0, "tespit": 0, "kodlanan_yuz": 0, "sure": 0.0}
+
+    def process(self, frame):
+        """
+        Kareyi işler ve (kutu, isim) listesini döndürür.
+        """
+        started = time.perf_counter()
+        if self.frame_index % self.detect_every == 0:
+            rgb_small_frame, small_locations = self.sfr.detect_faces(frame)
+            boxes = self.sfr.scale_locations(small_locations)
+            pending = self.tracker.update(boxes, frame)
+            if pending:
+                names = self.sfr.recognize_faces(rgb_small_frame, [small_locations[d] for _, d in pending])
+                for (track, _), name in zip(pending, names):
+                    # Düşük kaliteli yüz isimsiz kalır; sonraki tespitte (ör. yüz döndüğünde) yeniden denenir
+                    track.name = None if name == DUSUK_KALITE else name
+                self.stats["kodlanan_yuz"] += sum(1 for name in names if name != DUSUK_KALITE)
+            self.stats["tespit"] += 1
+        else:
+            self.tracker.predict(frame)
+
+        self.frame_index += 1
+        self.stats["kare"] += 1
+        self.stats["sure"] += time.perf_counter() - started
+        return [(track.box, track.name or DUSUK_KALITE) for track in self.tracker.tracks if track.missed == 0]
@@ -0,0 +1,237 @@
+import argparse
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from face_matcher import KODLAMA_BOYUTU, FaceGallery
+from gallery_cache import GALERI_SAYACI, GalleryVersionTracker
+from gallery_store import load_gallery, save_gallery
+
+# Birden fazla uvicorn işçisi aynı öğrenci galerisini paylaşır:
+#   - Yükleyici süreç (python shared_gallery.py) galeriyi <dizin>/nesil-<N>/ altına bir kez yazar
+#     ve <dizin>/GUNCEL işaretçisini atomik olarak yeni nesle çevirir.
+#   - İşçiler dosyayı salt okunur belleğe eşler (np.load mmap_mode='r'); fiziksel bellek
+#     işletim sistemi sayfa önbelleğinde tek kopya olarak kalır.
+# Dersler dosyada ardışık satır aralıkları olarak tutulur; ders galerisi kopyasız bir dilimdir.
+ISARETCI = "GUNCEL"
+GALERI_DOSYASI = "galeri"
+
+
+def _current_version(counters):
+    counter = counters.find_one({"_id": GALERI_SAYACI})
+    return counter["surum"] if counter else 0
+
+
+def _write_pointer(root, generation_name):
+    tmp_path = os.path.join(root, ISARETCI + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(generation_name)
+    os.replace(tmp_path, os.path.join(root, ISARETCI))
+
+
+def read_pointer(root):
+    try:
+        with open(os.path.join(root, ISARETCI), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def published_version(root):
+    """
+    İşaretçinin gösterdiği neslin galeri_surumu değeri; yayın yoksa veya okunamıyorsa None.
+    """
+    name = read_pointer(root)
+    if name is None:
+        return None
+    try:
+        _, _, header = load_gallery(os.path.join(root, name, GALERI_DOSYASI), mmap=True)
+    except (OSError, ValueError):
+        return None
+    return header.get("galeri_surumu")
+
+
+def publish(students, root, version):
+    """
+    Tüm ders galerilerini yeni bir nesil olarak yazar ve işaretçiyi ona çevirir.
+    version nesil başlığına yazılır; serve() burada neslin eksiksiz içerdiği en yüksek ardışık
+    sürümü verir (sorgu daha yeni kayıtları da görebilir).
+    """
+    by_lesson = {}
+    people = {}
+    for student in students.find(
+        {"yuz_kodlamalari.0": {"$exists": True}},
+        {"ad": 1, "soyad": 1, "ogrenciNo": 1, "lesson_name": 1, "yuz_kodlamalari": 1}
+    ):
+        people[student["ogrenciNo"]] = {"_id": str(student["_id"]), "ad": student["ad"], "soyad": student["soyad"]}
+        for lesson_name in student.get("lesson_name", []):
+            by_lesson.setdefault(lesson_name, []).append(student)
+
+    encodings, names, lessons = [], [], {}
+    for lesson_name, members in sorted(by_lesson.items()):
+        start = len(names)
+        for student in members:
+            for encoding in student["yuz_kodlamalari"]:
+                encodings.append(encoding)
+                names.append(student["ogrenciNo"])
+        lessons[lesson_name] = [start, len(names)]
+
+    generation = int(time.time() * 1000)
+    generation_name = f"nesil-{generation}"
+    os.makedirs(os.path.join(root, generation_name), exist_ok=True)
+    save_gallery(
+        os.path.join(root, generation_name, GALERI_DOSYASI),
+        np.asarray(encodings, dtype=np.float32).reshape(-1, KODLAMA_BOYUTU),
+        names,
+        extra={"nesil": generation, "galeri_surumu": version, "dersler": lessons, "ogrenciler": people}
+    )
+    _write_pointer(root, generation_name)
+    logging.info(f"Paylaşılan galeri yayımlandı: {generation_name}, sürüm {version}, {len(names)} satır, {len(lessons)} ders")
+    return version, generation_name
+
+
+def remove_old_generations(root, keep=2):
+    """
+    En yeni `keep` nesil dışındakileri siler. Eski nesli hâlâ eşlemiş bir işçi varsa
+    POSIX'te eşleme geçerli kalır; Windows'ta silme başarısız olur ve sonraki turda tekrar denenir.
+    """
+    current = read_pointer(root)
+    generations = sorted(name for name in os.listdir(root) if name.startswith("nesil-"))
+    for name in generations[:-keep]:
+        if name == current:
+            continue
+        try:
+            shutil.rmtree(os.path.join(root, name))
+        except OSError as e:
+            logging.debug(f"{name} silinemedi: {str(e)}")
+
+
+def serve(students, counters, root, interval=2.0, keep=2, gap_timeout=10.0):
+    """
+    Sürüm sayacını izler; kayıtlar değiştikçe yeni nesil yayımlar.
+    Sayaç belge yazılmadan önce artırıldığından, ardışık olmayan sürümler GalleryVersionTracker ile
+    beklenir: geç yazılan bir kayıt, sonraki bir sürüm önce yayımlanmış olsa bile yeni nesle girer.
+    Yükleyici yeniden başlatıldığında izleyici yayımlanmış neslin sürümünden başlar; kapalıyken
+    yapılan kayıtlar ilk turda görülür ve yeni nesil hemen yayımlanır.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = published_version(root)
+    if version is None:
+        version = _current_version(counters)
+        publish(students, root, version)
+    tracker = GalleryVersionTracker(version, gap_timeout)
+    while True:
+        current = _current_version(counters)
+        if current > tracker.version:
+            changed = list(students.find({"galeri_surumu": {"$gt": tracker.version}}, {"galeri_surumu": 1}))
+            fresh = tracker.unseen(changed)
+            if fresh:
+                # Yayın sorgusu değişiklik sorgusundan sonra çalışır; fresh içindeki her kayıt yeni nesildedir
+                tracker.advance(current, fresh)
+                publish(students, root, tracker.version)
+                remove_old_generations(root, keep)
+            else:
+                tracker.advance(current, [])
+        elif read_pointer(root) is None:
+            publish(students, root, tracker.version)
+        time.sleep(interval)
+
+
+class _Generation:
+    def __init__(self, root, name):
+        self.name = name
+        self.encodings, self.names, header = load_gallery(os.path.join(root, name, GALERI_DOSYASI), mmap=True)
+        self.version = header["galeri_surumu"]
+        self.lessons = header["dersler"]
+        self.students = {
+            ogrenciNo: {"_id": ObjectId(person["_id"]), "ad": person["ad"], "soyad": person["soyad"], "ogrenciNo": ogrenciNo}
+            for ogrenciNo, person in header["ogrenciler"].items()
+        }
+        self.galleries = {}
+
+
+class SharedGalleryReader:
+    """
+    LessonGalleryCache ile aynı arayüz (get/invalidate); galeri yükleyici sürecin yayımladığı
+    belleğe eşlenmiş dosyadan okunur. İşaretçi en fazla check_interval saniyede bir kontrol edilir;
+    yeni nesil görülünce referans tek atamayla değiştirilir, süren istekler eski nesille biter.
+    """
+
+    def __init__(self, root, check_interval=1.0, ann_min_rows=20000):
+        self.root = root
+        self.check_interval = check_interval
+        self.ann_min_rows = ann_min_rows
+        self._generation = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._generation.version if self._generation is not None else None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked < self.check_interval:
+            return self._generation
+        with self._lock:
+            self._checked = now
+            name = read_pointer(self.root)
+            if name is None:
+                raise RuntimeError(f"Paylaşılan galeri henüz yayımlanmadı: {self.root}")
+            if self._generation is None or self._generation.name != name:
+                self._generation = _Generation(self.root, name)
+                logging.info(f"Paylaşılan galeri nesline geçildi: {name}")
+            return self._generation
+
+    def get(self, lesson_name):
+        """
+        Dersin galerisini ve ogrenciNo -> öğrenci sözlüğünü döndürür.
+        Kodlama matrisi paylaşılan dosyanın kopyasız, salt okunur bir dilimidir.
+        """
+        generation = self._refresh()
+        entry = generation.galleries.get(lesson_name)
+        if entry is not None:
+            return entry
+        start, end = generation.lessons.get(lesson_name, (0, 0))
+        gallery = FaceGallery(generation.encodings[start:end], generation.names[start:end])
+        if len(gallery) >= self.ann_min_rows:
+            # IVF indeksi vektörleri listelere göre yeniden sıralar; bu kopya işçi başınadır
+            gallery.build_index("ivf")
+        students_by_no = {ogrenciNo: generation.students[ogrenciNo] for ogrenciNo in gallery.identities}
+        entry = generation.galleries[lesson_name] = (gallery, students_by_no)
+        return entry
+
+    def invalidate(self, lesson_name=None):
+        """
+        Bir sonraki istekte işaretçinin hemen yeniden okunmasını sağlar.
+        """
+        self._checked = 0.0
+
+
+# Yükleyici süreç: python shared_gallery.py --dizin paylasimli_galeri
+# İşçiler: GALLERY_SHARED_DIR=paylasimli_galeri uvicorn fastAPI:app --workers 4
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Öğrenci galerisini uvicorn işçileri için paylaşılan belleğe yayımlar.")
+    parser.add_argument("--dizin", default=os.getenv("GALLERY_SHARED_DIR", "paylasimli_galeri"), help="Yayın dizini.")
+    parser.add_argument("--aralik", type=float, default=2.0, help="Sürüm sayacı kontrol aralığı (sn).")
+    parser.add_argument("--sakla", type=int, default=2, help="Diskte tutulacak nesil sayısı.")
+    parser.add_argument("--bir-kez", action="store_true", help="Bir kez yayımla ve çık.")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_CLIENT"))
+    db = client[os.getenv("DATABASE_NAME")]
+    if args.bir_kez:
+        os.makedirs(args.dizin, exist_ok=True)
+        publish(db["OgrenciBilgileri"], args.dizin, _current_version(db["SistemSayaclari"]))
+        remove_old_generations(args.dizin, args.sakla)
+    else:
+        serve(db["OgrenciBilgileri"], db["SistemSayaclari"], args.dizin, args.aralik, args.sakla)
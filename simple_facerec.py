@@ -2,14 +2,81 @@ import face_recognition
 import cv2
 import os
 import glob
-import pickle
 import numpy as np
+from face_matcher import FaceGallery, match_faces
+from face_quality import DUSUK_KALITE, QualityThresholds, count_rejections, filter_faces
+from gallery_store import gallery_exists, load_gallery, save_gallery
+from face_index import build_index, load_index, save_index
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
+
+
+# Eğitim manifestosu: her görüntünün içerik özeti ve kodlama durumu
+# ("kodlandi", "yuz_yok" veya "hata"); yüz bulunamayan görüntüler her çalıştırmada tekrar denenmez.
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("dosyalar", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest_path, files):
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"surum": 1, "dosyalar": files}, f, ensure_ascii=False, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def refresh_manifest_entry(entry, path):
+    """
+    Dosya boyutu ve değişiklik zamanı aynıysa kaydı olduğu gibi döndürür; aksi halde
+    içerik özetini yeniden hesaplar. İçerik değiştiyse kodlama durumu sıfırlanır.
+    """
+    stat = os.stat(path)
+    if entry and entry["boyut"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return dict(entry)
+    sha1 = file_sha1(path)
+    status = entry.get("durum") if entry and entry["sha1"] == sha1 and entry.get("durum") != "hata" else None
+    return {"sha1": sha1, "boyut": stat.st_size, "mtime": stat.st_mtime, "durum": status}
+
+
+def index_file_path(encoding_file_path):
+    return os.path.splitext(encoding_file_path)[0] + ".index.npz"
+
+
+def encode_image_file(img_path):
+    """
+    Tek bir eğitim görüntüsünü kodlar (süreç havuzunda çalışır).
+    """
+    try:
+        img = face_recognition.load_image_file(img_path)
+        face_encodings = face_recognition.face_encodings(img)
+    except Exception:
+        return "hata", None
+    if len(face_encodings) > 0: # Eğer kodlama alınabilmişse, kodlama dizisinin ilk elemanı alınır.
+        return "kodlandi", face_encodings[0]
+    return "yuz_yok", None
+
 
 class SimpleFacerec:
     def __init__(self):
         self.known_face_encodings = [] # known_face_encodings: Tanınmış yüzlerin kodlamalarını saklamak için bir liste.
         self.known_face_names = []  # known_face_names: Tanınmış yüzlerin isimlerini saklamak için bir liste.
         self.frame_resizing = 0.75  # Daha hızlı bir hız için çerçeveyi yeniden boyutlandır
+        self.tolerance = 0.5  # Bu mesafenin altındaki eşleşmeler kabul edilir
+        self.gallery = FaceGallery([], [])  # Vektörel eşleştirme için kodlama matrisi
+        self.ann_min_rows = 20000  # Bu satır sayısının üzerinde yaklaşık (IVF) indeks kullanılır
+        self.quality = QualityThresholds.from_env()  # Küçük, bulanık veya profil yüzler kodlanmaz
+        self.quality_stats = {"kabul": 0}  # Kalite kontrolü sayaçları (kabul ve neden bazında red)
 
     
     # Histogram eşitlemesi ile görüntüyü işleme fonksiyonu 
@@ -21,76 +88,146 @@ class SimpleFacerec:
     
 
     # Yüz Modeli Yükleme ve Eğitim Metodu
-    def load_and_train_model(self, images_root_path, encoding_file_path): # images_root_path: Yüz görüntülerinin bulunduğu ana dizin yolu , # encoding_file_path: Kodlamaların kaydedileceği dosya yolu.
-        known_face_encodings = []
-        known_face_names = []
-
-        img_folders = os.listdir(images_root_path) # os.listdir(images_root_path): Belirtilen dizindeki dosya ve klasörlerin listesini alır.
-        
-        # Her Klasörü Dolaşma ve Yüz Görüntülerini Yükleme
+    # Yalnızca yeni veya değişen görüntüler kodlanır; silinen klasörlerin kodlamaları galeriden çıkarılır.
+    def load_and_train_model(self, images_root_path, encoding_file_path, workers=None): # images_root_path: Yüz görüntülerinin bulunduğu ana dizin yolu , # encoding_file_path: Galeri dosyasının yolu (.npy/.json uzantısız).
+        manifest_path = os.path.splitext(encoding_file_path)[0] + ".manifest.json"
+        manifest = load_manifest(manifest_path)
+
+        # Önceki galerideki kodlamalar kaynak dosya yoluna göre yeniden kullanılır
+        previous = {}
+        if gallery_exists(encoding_file_path):
+            encodings, _, header = load_gallery(encoding_file_path, mmap=False)
+            previous = dict(zip(header.get("kaynaklar", []), encodings))
+
+        images = []  # (göreli yol, klasör adı)
+        img_folders = sorted(os.listdir(images_root_path)) # os.listdir(images_root_path): Belirtilen dizindeki dosya ve klasörlerin listesini alır.
         for folder_name in img_folders:
             folder_path = os.path.join(images_root_path, folder_name)
             if not os.path.isdir(folder_path):
                 continue
+            # Klasör İçindeki Görüntüleri Bulma
+            for img_path in sorted(glob.glob(os.path.join(folder_path, "*.*"))):
+                images.append((os.path.relpath(img_path, images_root_path), folder_name))
+
+        # Değişmeyen görüntüleri ayıkla, kalanları kodlama kuyruğuna al
+        files = {}
+        to_encode = []
+        for rel_path, _ in images:
+            entry = refresh_manifest_entry(manifest.get(rel_path), os.path.join(images_root_path, rel_path))
+            files[rel_path] = entry
+            unchanged = entry.get("durum") is not None
+            if unchanged and (entry["durum"] == "yuz_yok" or rel_path in previous):
+                continue
+            to_encode.append(rel_path)
+
+        # Yeni/değişen görüntüler süreç havuzunda paralel kodlanır
+        encoded = {}
+        if to_encode:
+            print(f"{len(to_encode)} görüntü kodlanacak ({len(images) - len(to_encode)} görüntü önbellekten).")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(encode_image_file, os.path.join(images_root_path, rel_path)): rel_path
+                    for rel_path in to_encode
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    rel_path = futures[future]
+                    status, encoding = future.result()
+                    files[rel_path]["durum"] = status
+                    if encoding is not None:
+                        encoded[rel_path] = encoding
+                    print(f"[{done}/{len(to_encode)}] {rel_path}: {status}")
 
-        # Klasör İçindeki Görüntüleri Bulma
-            images_path = glob.glob(os.path.join(folder_path, "*.*"))
-
-            for img_path in images_path:
-                img = face_recognition.load_image_file(img_path)
-
-                # Yüz kodlamasını al
-                face_encodings = face_recognition.face_encodings(img)
-                if len(face_encodings) > 0: # Eğer kodlama alınabilmişse, kodlama dizisinin ilk elemanı alınır ve iki listeye eklenir.
-                    img_encoding = face_encodings[0]
-                    known_face_encodings.append(img_encoding)
-                    known_face_names.append(folder_name)
-
-        # Kodlamaları kaydet
-        with open(encoding_file_path, 'wb') as f:  # 'wb' modunda açarak yazma işlemi yaptık
-            pickle.dump((known_face_encodings, known_face_names), f)
-            print(f"Model eğitildi ve {len(known_face_encodings)} kodlama kaydedildi.")
-    
-    
+        known_face_encodings = []
+        known_face_names = []
+        sources = []
+        for rel_path, folder_name in images:
+            encoding = encoded.get(rel_path)
+            if encoding is None and files[rel_path]["durum"] == "kodlandi":
+                encoding = previous.get(rel_path)
+            if encoding is None:
+                continue
+            known_face_encodings.append(encoding)
+            known_face_names.append(folder_name)
+            sources.append(rel_path)
+
+        # Kodlamaları belleğe eşlenebilir galeri biçiminde kaydet; listede olmayan dosyalar budanır
+        save_gallery(encoding_file_path, known_face_encodings, known_face_names, extra={"kaynaklar": sources})
+        save_manifest(manifest_path, files)
+
+        # Galerinin yanındaki indeks varsa artımlı güncellenir: silinen/değişen satırlar çıkarılır, yeniler eklenir
+        index_path = index_file_path(encoding_file_path)
+        if os.path.exists(index_path):
+            index = load_index(index_path)
+            current = set(sources)
+            index.remove([key for key in index.keys if key not in current or key in encoded])
+            indexed = set(index.keys)
+            new_rows = [i for i, rel_path in enumerate(sources) if rel_path not in indexed]
+            if new_rows:
+                index.add([sources[i] for i in new_rows], [known_face_encodings[i] for i in new_rows])
+            save_index(index, index_path)
+        print(f"Model eğitildi ve {len(known_face_encodings)} kodlama kaydedildi.")
 
     # Yüz Kodlamalarını Yükleme Metodu
-    def load_encoding_images(self, encoding_file_path): # encoding_file_path: Yüz kodlamalarının kaydedildiği dosya yolu.
+    def load_encoding_images(self, encoding_file_path): # encoding_file_path: Galeri dosyasının yolu (.npy/.json uzantısız).
         try:
-            with open(encoding_file_path, 'rb') as f:
-                self.known_face_encodings, self.known_face_names = pickle.load(f) # pickle.load: Kodlamaları ve isimleri dosyadan yükler.
+            # Matris kopyalanmadan belleğe eşlenir; büyük galerilerde açılış neredeyse anlıktır
+            self.known_face_encodings, self.known_face_names, header = load_gallery(encoding_file_path)
+            self.gallery = FaceGallery(self.known_face_encodings, self.known_face_names)
+            self.prepare_index(encoding_file_path, header.get("kaynaklar"))
             print("Kodlamalar yüklendi.")
         except FileNotFoundError:
             print("Kodlama dosyası bulunamadı. Lütfen modeli önce eğitin.")
 
     
 
-    # Tanınmış Yüzleri Algılama Metodu
-    def detect_known_faces(self, frame):
+    # Büyük galeriler için yaklaşık en yakın komşu indeksini yükleme/oluşturma metodu
+    def prepare_index(self, encoding_file_path, sources):
+        if len(self.gallery) < self.ann_min_rows or not sources:
+            return
+        index_path = index_file_path(encoding_file_path)
+        index = load_index(index_path) if os.path.exists(index_path) else None
+        if index is None or len(index) != len(sources):
+            # Kaynak dosya yolları anahtar olduğundan indeks sonraki eğitimlerde artımlı güncellenebilir
+            index = build_index("ivf", list(sources), self.gallery.encodings)
+            save_index(index, index_path)
+        self.gallery.attach_index(index, row_keys=sources)
+        print(f"Yaklaşık arama indeksi etkin ({len(index)} satır).")
+
+    # Yüz Konumlarını Algılama Metodu (kodlama yapmaz)
+    def detect_faces(self, frame):
         # Çerçeveyi yeniden boyutlandırın ve RGB formatına çevirin
         small_frame = cv2.resize(frame, (0, 0), fx=self.frame_resizing, fy=self.frame_resizing) # cv2.resize: Görüntüyü yeniden boyutlandırır.
         rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB) # cv2.cvtColor: Görüntüyü RGB formatına çevirir.
-
-        # Yüzleri algılayın
         face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-        face_names = []
-        
-        for face_encoding in face_encodings:
-            # Yüzün bilinen yüzlerle eşleşip eşleşmediğine bakın
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-            name = "Taninamadi"
-
-            # Eşleşme varsa, en yakın eşleşmeyi bulun
-            if True in matches:
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding) # face_distances: Yüzlerin benzerliğini ölçmek için kullanılır.
-                best_match_index = np.argmin(face_distances) # best_match_index: En yakın eşleşmenin indeksini bulur.
-                if matches[best_match_index] and face_distances[best_match_index] <0.5:
-                    name = self.known_face_names[best_match_index] # face_locations ve face_names döndürülerek, algılanan yüzlerin konumları ve isimleri geri gönderilir.
+        return rgb_small_frame, face_locations # Konumlar küçültülmüş çerçeve koordinatlarındadır
+
+    # Verilen Konumlardaki Yüzleri Tanıma Metodu
+    # Kalite kontrolünü geçemeyen yüzler kodlanmaz ve DUSUK_KALITE etiketiyle döner
+    def recognize_faces(self, rgb_small_frame, face_locations):
+        if len(face_locations) == 0:
+            return []
+        accepted, rejected = filter_faces(rgb_small_frame, face_locations, self.quality)
+        self.quality_stats["kabul"] += len(accepted)
+        count_rejections(rejected, self.quality_stats)
+        names = [DUSUK_KALITE] * len(face_locations)
+        if not accepted:
+            return names
+        face_encodings = face_recognition.face_encodings(rgb_small_frame, [face_locations[i] for i in accepted])
+        # Tüm yüzler galeriyle tek bir matris işlemiyle karşılaştırılır; bir isim en fazla bir yüze atanır
+        matches = match_faces(face_encodings, self.gallery, self.tolerance)
+        for i, (name, _) in zip(accepted, matches):
+            names[i] = name if name is not None else "Taninamadi"
+        return names
+
+    # Küçültülmüş çerçeve koordinatlarını orijinal çerçeveye taşır
+    def scale_locations(self, face_locations):
+        face_locations = np.array(face_locations).reshape(-1, 4)
+        return (face_locations / self.frame_resizing).astype(int)
 
-            face_names.append(name)
+    # Tanınmış Yüzleri Algılama Metodu
+    def detect_known_faces(self, frame):
+        rgb_small_frame, face_locations = self.detect_faces(frame)
+        face_names = self.recognize_faces(rgb_small_frame, face_locations)
 
         # Yüz konumlarını yeniden boyutlandırarak ayarlayın
-        face_locations = np.array(face_locations)
-        face_locations = face_locations / self.frame_resizing
-        return face_locations.astype(int), face_names
+        return self.scale_locations(face_locations), face_names
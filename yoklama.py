@@ -1,78 +1,71 @@
+import argparse
 import cv2
-import json
-import time
-from datetime import datetime
 from simple_facerec import SimpleFacerec
-
-
-
-# Yoklama fonksiyonu
-def yoklama(name):
-    try:
-        with open("yoklama.json", "r") as json_file:
-            data = json.load(json_file)
-    except FileNotFoundError:
-        data = []
-    
-    name_list = [entry["name"] for entry in data]
-    
-    if name not in name_list:
-        now = datetime.now()
-        dtString = now.strftime('%d,%m, %A %H:%M:%S')
-        entry = {"name": name, "zaman": dtString}
-        data.append(entry)
-
-        with open("yoklama.json", "w") as file:
-            json.dump(data, file, indent=4)
+from gallery_store import gallery_exists
+from realtime_pipeline import FrameGrabber, RecognitionPipeline
+from attendance_recorder import AttendanceRecorder
+from face_quality import DUSUK_KALITE
 
 # Ana program
 if __name__ == "__main__":
-    # SimpleFacerec sınıfını başlatın ve kodlamaları yükleyin
+    parser = argparse.ArgumentParser(description="Kamera ile yüz tanıma yoklaması.")
+    parser.add_argument("--egit", action="store_true", help="Başlamadan önce yeni/değişen görüntüleri kodla.")
+    parser.add_argument("--isci", type=int, default=None, help="Eğitimde kullanılacak süreç sayısı.")
+    parser.add_argument("--video", default=None, help="Kamera yerine video dosyası kullan (çevrimdışı kıyaslama).")
+    parser.add_argument("--tespit-araligi", type=int, default=5, help="Tam yüz tespiti kaç karede bir yapılsın.")
+    parser.add_argument("--ekransiz", action="store_true", help="Görüntü penceresi açmadan çalış.")
+    args = parser.parse_args()
+
+    # SimpleFacerec sınıfını başlatın; galeri yoksa veya istenirse artımlı eğitim yapılır
     sfr = SimpleFacerec()
-    sfr.load_and_train_model("images/", "face_encodings.pkl")
+    if args.egit or not gallery_exists("face_gallery"):
+        sfr.load_and_train_model("images/", "face_gallery", workers=args.isci)
 
     # Kodlamaları yükle
-    sfr.load_encoding_images("face_encodings.pkl")  # Daha önce eğitilmiş kodlamaları yükle
-
-    # Kamerayı başlat
-    cap = cv2.VideoCapture(0)
-
-
-    # Kamera Çözünürlüğünü arttırma 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH , 1280) # Genişlik
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT , 720) # Yükseklik
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Kamera görüntüsü alinamiyor!")
-            break
+    sfr.load_encoding_images("face_gallery")  # Daha önce eğitilmiş kodlamaları yükle
 
+    # Kamerayı (veya kıyaslama için video dosyasını) ayrı iş parçacığında başlat
+    source = args.video if args.video else 0
+    grabber = FrameGrabber(source, drop_frames=not args.video, width=1280, height=720).start()  # Kamera Çözünürlüğünü arttırma
+    pipeline = RecognitionPipeline(sfr, detect_every=args.tespit_araligi)
+    # Yoklama kayıtları bellekte tutulur, arka planda yoklama.jsonl dosyasına eklenir
+    recorder = AttendanceRecorder("yoklama.jsonl")
 
-        # Görüntüyü histogram eşitlemesi ile işleme
-        preprocessed_frame = sfr.preprocess_frame(frame)
-        face_locations, face_names = sfr.detect_known_faces(preprocessed_frame)
-
-
-        # Yüzleri algıla ve tanı
-        face_locations, face_names = sfr.detect_known_faces(frame)        
-        for face_loc, name in zip(face_locations, face_names):
-            y1, x2, y2, x1 = face_loc[0], face_loc[1], face_loc[2], face_loc[3]
-            cv2.putText(frame, name, (x1, y1 - 10), cv2.FONT_HERSHEY_DUPLEX, 1, (0, 0, 200), 2)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 4)
-
-            # Yoklama işlemi
-            yoklama(name)
-
-        cv2.imshow("Yüz Tanima", frame)
-
-        # ESC tuşuna basılırsa kamerayı durdur
-        if cv2.waitKey(1) & 0xFF == 27:
-            break
-
-        time.sleep(0.5) # Her çerçeve arasında 0.5 salise bekleme süresi 
-
-    # Kamera serbest bırakılır ve pencereler kapatılır
-    cap.release()
-    cv2.destroyAllWindows()
+    # ESC, video sonu veya Ctrl+C ile çıkışta kalan kayıtlar mutlaka yazılır
+    try:
+        while True:
+            frame = grabber.read()
+            if frame is None:
+                if grabber.stopped:
+                    print("Kamera görüntüsü alinamiyor!" if not args.video else "Video sona erdi.")
+                    break
+                continue
+
+            # Yüzleri algıla ve tanı (tam tespit her N karede bir, arada takip)
+            for face_loc, name in pipeline.process(frame):
+                y1, x2, y2, x1 = face_loc[0], face_loc[1], face_loc[2], face_loc[3]
+                cv2.putText(frame, name, (x1, y1 - 10), cv2.FONT_HERSHEY_DUPLEX, 1, (0, 0, 200), 2)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 4)
+
+                # Yoklama işlemi (kalite kontrolünü geçemeyen yüzler kaydedilmez)
+                if name != DUSUK_KALITE:
+                    recorder.mark(name)
+
+            if not args.ekransiz:
+                cv2.imshow("Yüz Tanima", frame)
+
+                # ESC tuşuna basılırsa kamerayı durdur
+                if cv2.waitKey(1) & 0xFF == 27:
+                    break
+    finally:
+        # Kamera serbest bırakılır, kalan kayıtlar yazılır ve pencereler kapatılır
+        recorder.close()
+        grabber.release()
+        cv2.destroyAllWindows()
+
+    stats = pipeline.stats
+    if stats["kare"]:
+        print(f"{stats['kare']} kare, {stats['tespit']} tespit, {stats['kodlanan_yuz']} yüz kodlandı, "
+              f"{stats['kare'] / stats['sure']:.1f} kare/sn, atılan kare: {grabber.dropped}")
+        print(f"Kalite kontrolü: {sfr.quality_stats}")
     print("Yüz tanima işlemi tamamlandi.")